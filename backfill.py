@@ -0,0 +1,139 @@
+"""
+Point-in-time ratios backfill into ratios_history, one download per ticker,
+a ticker in several of the indexes is backfilled once:
+    python backfill.py --index SPX NDX --start 2014-01 --end 2023-12
+"""
+from datetime import datetime
+from typing import Dict, List
+import argparse
+import asyncio
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from db import database  # type: ignore
+from jobs import executor, ratios_record  # type: ignore
+from ratios import (  # type: ignore
+    define_time,
+    div_p,
+    e_p,
+    get_sources,
+    ma_10,
+    momentum_12,
+    momentum_avg,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def month_as_of(months: List[str]) -> List[datetime]:
+    """
+    as_of dates whose define_time() last ended month is each YYYY-MM month
+    """
+    return [
+        datetime.strptime(month, "%Y-%m") + relativedelta(months=1) for month in months
+    ]
+
+
+def month_range(start: str, end: str) -> List[str]:
+    month = datetime.strptime(start, "%Y-%m")
+    last = datetime.strptime(end, "%Y-%m")
+    months = []
+    while month <= last:
+        months.append(month.strftime("%Y-%m"))
+        month += relativedelta(months=1)
+    return months
+
+
+def ticker_history(ticker: str, as_ofs: List[datetime]) -> List[Dict]:
+    """
+    Download ticker sources once, slice them for every as_of in memory
+    ratio is None for months without enough data
+    """
+    sources = get_sources(ticker, as_ofs[0], as_ofs[-1])
+    daily = sources["daily"]
+    functions = {
+        "momentum_12_2": lambda as_of: momentum_12(ticker, -2, as_of, daily),
+        "momentum_avg": lambda as_of: momentum_avg(ticker, as_of, daily),
+        "e_p": lambda as_of: e_p(
+            ticker, as_of, daily, sources["income"], sources["shares"]
+        ),
+        "ma_10": lambda as_of: ma_10(ticker, as_of, sources["weekly"]),
+        "div_p": lambda as_of: div_p(ticker, as_of, daily, sources["dividends"]),
+    }
+    history = []
+    for as_of in as_ofs:
+        ratios = {}
+        for field, function in functions.items():
+            try:
+                ratios[field] = function(as_of)
+            except (IndexError, KeyError, ZeroDivisionError):
+                ratios[field] = None
+        history.append(ratios)
+    return history
+
+
+async def backfill_ticker(
+    ticker: str, as_ofs: List[datetime], semaphore: asyncio.Semaphore
+) -> int:
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            history = await loop.run_in_executor(executor, ticker_history, ticker, as_ofs)
+        except Exception as error:
+            logger.warning("Backfill %s failed: %s", ticker, error)
+            return 0
+        await database.ratios_history.bulk_write(
+            [
+                ratios_record(ticker, as_of, ratios)
+                for as_of, ratios in zip(as_ofs, history)
+            ],
+            ordered=False,
+        )
+        logger.info("Backfilled %s, %s months", ticker, len(history))
+        return len(history)
+
+
+async def backfill(indexes: List[str], start: str, end: str, workers: int) -> None:
+    indexes_db = await database.indexes.find({"ticker": {"$in": indexes}}).to_list(None)
+    unknown = set(indexes) - {i["ticker"] for i in indexes_db}
+    if unknown:
+        raise SystemExit(f"Index not found: {', '.join(sorted(unknown))}")
+    stocks_db = await database.stocks.find(
+        {"index_id": {"$in": [str(i["_id"]) for i in indexes_db]}}, {"ticker": 1}
+    ).to_list(None)
+    # ratios_history is per ticker, stocks sharing a ticker need one run
+    tickers = sorted({i["ticker"] for i in stocks_db})
+    as_ofs = month_as_of(month_range(start, end))
+    semaphore = asyncio.Semaphore(workers)
+    written = await asyncio.gather(
+        *(backfill_ticker(ticker, as_ofs, semaphore) for ticker in tickers)
+    )
+    logger.info(
+        "Backfilled %s tickers x %s months, %s records",
+        len(tickers),
+        len(as_ofs),
+        sum(written),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ratios history backfill")
+    parser.add_argument("--index", required=True, nargs="+", help="Index tickers")
+    parser.add_argument("--start", required=True, help="First month, YYYY-MM")
+    parser.add_argument("--end", required=True, help="Last month, YYYY-MM")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    # Months up to last one past its 28th, later ones have no closes yet
+    _, last_month = define_time()
+    if args.end > last_month.strftime("%Y-%m"):
+        parser.error(f"--end must be {last_month:%Y-%m} or earlier")
+    if not month_range(args.start, args.end):
+        parser.error("--start must not be after --end")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill(args.index, args.start, args.end, args.workers))
+
+
+if __name__ == "__main__":
+    main()
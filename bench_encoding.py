@@ -0,0 +1,77 @@
+"""
+Bytes on the wire and encode CPU per response format for a synthetic
+full-index stocks list:
+    python bench_encoding.py --stocks 500
+"""
+from typing import Callable, Dict, List
+import argparse
+import json
+import random
+import time
+import zlib
+
+import brotli  # type: ignore
+import msgpack  # type: ignore
+
+
+def stocks_list(number: int) -> List[Dict]:
+    return [
+        {
+            "name": f"Company {i} Holdings",
+            "ticker": f"C{i}",
+            "index_id": "63b5a1f0c2a4e8b1d6f0a9c3",
+            "momentum_12_2": round(random.gauss(0.1, 0.3), 3),
+            "momentum_avg": round(random.gauss(1.05, 0.2), 2),
+            "e_p": round(random.gauss(0.06, 0.04), 3),
+            "ma_10": random.randint(0, 1),
+            "div_p": round(abs(random.gauss(0.02, 0.02)), 3),
+            "id": f"{i:024x}",
+        }
+        for i in range(number)
+    ]
+
+
+def gzip(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def br(data: bytes, quality: int) -> bytes:
+    return brotli.compress(data, quality=quality)
+
+
+def measure(encode: Callable[[], bytes], repeat: int) -> Dict:
+    start = time.process_time()
+    for _ in range(repeat):
+        body = encode()
+    cpu = (time.process_time() - start) / repeat
+    return {"bytes": len(body), "cpu_ms": round(cpu * 1000, 3)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Response formats benchmark")
+    parser.add_argument("--stocks", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    args = parser.parse_args()
+
+    content = stocks_list(args.stocks)
+    formats = {
+        "json": lambda: json.dumps(content).encode(),
+        "json+gzip": lambda: gzip(json.dumps(content).encode(), args.gzip_level),
+        "json+br": lambda: br(json.dumps(content).encode(), args.brotli_quality),
+        "msgpack": lambda: msgpack.packb(content),
+        "msgpack+gzip": lambda: gzip(msgpack.packb(content), args.gzip_level),
+        "msgpack+br": lambda: br(msgpack.packb(content), args.brotli_quality),
+    }
+    results = {name: measure(encode, args.repeat) for name, encode in formats.items()}
+    plain = results["json"]["bytes"]
+    print(f"{'format':<14}{'bytes':>10}{'ratio':>8}{'cpu ms':>10}")
+    for name, result in results.items():
+        ratio = plain / result["bytes"]
+        print(f"{name:<14}{result['bytes']:>10}{ratio:>8.1f}{result['cpu_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from bson import ObjectId  # type: ignore
+
+from db import database  # type: ignore
+from settings import Settings  # type: ignore
+
+settings: Any = Settings()
+
+# (index_id, key) -> (stocks_version, value), per worker process
+# least recently used first, bound by INDEX_CACHE_SIZE
+index_cache: "OrderedDict[Tuple[str, Hashable], Tuple[int, Any]]" = OrderedDict()
+
+
+async def touch_index(*index_ids: Optional[str]) -> None:
+    """
+    Bump stocks_version of indexes after their stocks were written
+    cached index data with older version is recomputed on next read
+    """
+    object_ids = [ObjectId(i) for i in index_ids if i and ObjectId.is_valid(i)]
+    if object_ids:
+        await database.indexes.update_many(
+            {"_id": {"$in": object_ids}}, {"$inc": {"stocks_version": 1}}
+        )
+
+
+def get_cached(index_db: Dict, key: Hashable) -> Optional[Any]:
+    cache_key = (str(index_db["_id"]), key)
+    cached = index_cache.get(cache_key)
+    if cached is None:
+        return None
+    if cached[0] != index_db.get("stocks_version", 0):
+        del index_cache[cache_key]
+        return None
+    index_cache.move_to_end(cache_key)
+    return cached[1]
+
+
+def set_cached(index_db: Dict, key: Hashable, value: Any) -> None:
+    """
+    One entry per (index, key), replaced on version change
+    """
+    cache_key = (str(index_db["_id"]), key)
+    index_cache[cache_key] = (index_db.get("stocks_version", 0), value)
+    index_cache.move_to_end(cache_key)
+    while len(index_cache) > settings.INDEX_CACHE_SIZE:
+        index_cache.popitem(last=False)
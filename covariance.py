@@ -0,0 +1,108 @@
+from typing import Dict
+import asyncio
+
+from bson import Binary  # type: ignore
+import numpy as np
+import pandas as pd  # type: ignore
+
+from db import database  # type: ignore
+from history import load_history  # type: ignore
+from ratios import define_time  # type: ignore
+from singleflight import SingleFlight  # type: ignore
+from timeseries import covariance  # type: ignore
+
+# Trading days after define_time() end (28th of last month) up to today, at most
+LAG_DAYS = 23
+
+# Shortest cached history period covering window daily returns, about 250
+# closes a year less the first close and the lag cut off after define_time()
+PERIOD_DAYS = [
+    (period, 250 * years - 1 - LAG_DAYS)
+    for period, years in [("1y", 1), ("2y", 2), ("5y", 5), ("10y", 10)]
+]
+
+# Share of window returns a ticker needs to stay in the matrix
+MIN_COVERAGE = 0.9
+
+covariance_flight = SingleFlight()
+
+
+def history_period(window: int) -> str:
+    return next(period for period, days in PERIOD_DAYS if days >= window)
+
+
+async def build_covariance(index_db: Dict, window: int, month: str) -> Dict:
+    """
+    Align index stocks close prices into one panel and compute covariance
+    of last window daily returns up to define_time() end
+    """
+    stocks_db = await database.stocks.find(
+        {"index_id": str(index_db["_id"])}, {"ticker": 1}
+    ).to_list(None)
+    tickers = sorted({i["ticker"] for i in stocks_db})
+    period = history_period(window)
+    histories = await asyncio.gather(
+        *(load_history(ticker, period, "1d") for ticker in tickers),
+        return_exceptions=True,
+    )
+
+    _, last_month = define_time()
+    closes = {
+        ticker: pd.Series(history["close"], index=history["date"])
+        for ticker, history in zip(tickers, histories)
+        if isinstance(history, dict) and history["date"]
+    }
+    covered, matrix = [], np.empty((0, 0), dtype=np.float32)
+    returns = pd.DataFrame()
+    if closes:
+        panel = pd.DataFrame(closes).sort_index()
+        returns = (
+            panel[panel.index <= last_month]
+            .pct_change(fill_method=None)
+            .iloc[1:]
+            .tail(window)
+        )
+        covered = list(returns.columns[returns.notna().mean() >= MIN_COVERAGE])
+    if covered and len(returns) > 1:
+        matrix = covariance(returns[covered].to_numpy()).astype(np.float32)
+    else:
+        covered = []
+
+    return {
+        "_id": f"{index_db['_id']}:{window}:{month}",
+        "stocks_version": index_db.get("stocks_version", 0),
+        "tickers": covered,
+        "dropped": [i for i in tickers if i not in set(covered)],
+        "observations": len(returns),
+        "matrix": Binary(matrix.tobytes()),
+    }
+
+
+async def rebuild_covariance(index_db: Dict, window: int, month: str) -> Dict:
+    cached = await build_covariance(index_db, window, month)
+    await database.covariance.replace_one({"_id": cached["_id"]}, cached, upsert=True)
+    return cached
+
+
+async def get_covariance(index_db: Dict, window: int) -> Dict:
+    """
+    Covariance as float32 matrix, cached per (index, window, month)
+    recomputed when index stocks_version changed, concurrent requests
+    for a cold key wait for one build
+    """
+    _, last_month = define_time()
+    month = last_month.strftime("%Y-%m")
+    key = f"{index_db['_id']}:{window}:{month}"
+    cached = await database.covariance.find_one({"_id": key})
+    if cached is None or cached["stocks_version"] != index_db.get("stocks_version", 0):
+        cached = await covariance_flight.do(
+            key, lambda: rebuild_covariance(index_db, window, month)
+        )
+    # Build result is shared by coalesced requests, decode a copy
+    cached = dict(cached)
+    size = len(cached["tickers"])
+    cached["matrix"] = np.frombuffer(cached["matrix"], dtype=np.float32).reshape(
+        size, size
+    )
+    cached["month"] = month
+    return cached
@@ -1,7 +1,27 @@
 from settings import Settings
+from models.stocks import RATIO_FIELDS
 import motor.motor_asyncio
+import pymongo
 
 settings = Settings()
 
 client = motor.motor_asyncio.AsyncIOMotorClient(settings.DATABASE)
-database = client.investments
\ No newline at end of file
+database = client[settings.DATABASE_NAME]
+
+
+async def create_indexes() -> None:
+    """
+    Idempotent, runs on every worker startup
+    """
+    await database.stocks.create_index("ticker")
+    # Screener and list endpoints filter by index and sort by a ratio
+    for field in RATIO_FIELDS:
+        await database.stocks.create_index(
+            [("index_id", pymongo.ASCENDING), (field, pymongo.DESCENDING)]
+        )
+    await database.jobs.create_index(
+        [("status", pymongo.ASCENDING), ("available_at", pymongo.ASCENDING)]
+    )
+    await database.jobs.create_index("lease_until")
+    await database.jobs.create_index("batches")
+    await database.ratios_history.create_index("period")
\ No newline at end of file
@@ -0,0 +1,127 @@
+from typing import AsyncIterator, Dict, List
+import csv
+import io
+
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+
+from db import database  # type: ignore
+from models.stocks import RATIO_FIELDS  # type: ignore
+from snapshots import get_snapshot  # type: ignore
+
+SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("ticker", pa.string()),
+        ("name", pa.string()),
+        ("momentum_12_2", pa.float64()),
+        ("momentum_avg", pa.float64()),
+        ("e_p", pa.float64()),
+        ("ma_10", pa.int64()),
+        ("div_p", pa.float64()),
+    ]
+)
+EXPORT_FIELDS = SCHEMA.names
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+class ChunkSink(io.RawIOBase):
+    """
+    Write-only file collecting encoded bytes between drains
+    tell() keeps counting across drains, parquet footer offsets rely on it
+    """
+
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def stock_batches(index_db: Dict, batch_size: int) -> AsyncIterator[Dict]:
+    """
+    Index stocks as column batches read from cursor batch by batch
+    """
+    cursor = database.stocks.find(
+        {"index_id": str(index_db["_id"])}, {i: 1 for i in ["ticker", "name"] + RATIO_FIELDS}
+    ).batch_size(batch_size)
+    while True:
+        stocks_db = await cursor.to_list(length=batch_size)
+        if not stocks_db:
+            return
+        yield {
+            "id": [str(i["_id"]) for i in stocks_db],
+            **{field: [i.get(field) for i in stocks_db] for field in EXPORT_FIELDS[1:]},
+        }
+
+
+async def snapshot_batches(index_db: Dict, batch_size: int) -> AsyncIterator[Dict]:
+    snapshot = await get_snapshot(index_db)
+    for start in range(0, len(snapshot["id"]), batch_size):
+        yield {
+            field: snapshot[field][start : start + batch_size] for field in EXPORT_FIELDS
+        }
+
+
+async def encode_csv(batches: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    async for batch in batches:
+        writer.writerows(zip(*(batch[field] for field in EXPORT_FIELDS)))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+async def encode_arrow(batches: AsyncIterator[Dict], fmt: str) -> AsyncIterator[bytes]:
+    sink = ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), SCHEMA)
+        write = writer.write_table
+        to_data = pa.Table.from_pydict
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), SCHEMA)
+        write = writer.write_batch
+        to_data = pa.RecordBatch.from_pydict
+    async for batch in batches:
+        write(to_data(batch, schema=SCHEMA))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_stocks(
+    index_db: Dict, fmt: str, source: str, batch_size: int
+) -> AsyncIterator[bytes]:
+    """
+    Stream index stocks encoded as csv, parquet (row group per batch)
+    or arrow IPC stream (record batch per batch), memory bound by batch_size
+    """
+    if source == "snapshot":
+        batches = snapshot_batches(index_db, batch_size)
+    else:
+        batches = stock_batches(index_db, batch_size)
+    if fmt == "csv":
+        return encode_csv(batches)
+    return encode_arrow(batches, fmt)
@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import Dict, List
+import asyncio
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from db import database  # type: ignore
+from ratios import get_price_history  # type: ignore
+from singleflight import SingleFlight  # type: ignore
+from timeseries import lttb  # type: ignore
+
+PERIODS = ["1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"]
+INTERVALS = ["1d", "1wk", "1mo"]
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Refresh jobs, /history and /covariance requests share downloads by key
+history_flight = SingleFlight()
+
+
+def fetch_history(ticker: str, period: str, interval: str) -> Dict:
+    """
+    Blocking yfinance download as columns, rows without close dropped
+    """
+    series = get_price_history(ticker, period, interval).dropna(subset=["Close"])
+    return {
+        "date": [i.to_pydatetime().replace(tzinfo=None) for i in series.index],
+        **{i: series[i.capitalize()].astype(float).tolist() for i in COLUMNS},
+    }
+
+
+async def load_history(ticker: str, period: str, interval: str) -> Dict:
+    """
+    Price history from price_history collection, downloaded once a day
+    concurrent misses of the same key wait for one download
+    """
+    key = f"{ticker}:{period}:{interval}"
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    history = await database.price_history.find_one({"_id": key})
+    if history is not None and history["fetched"] >= today:
+        return history
+
+    async def download() -> Dict:
+        loop = asyncio.get_running_loop()
+        columns = await loop.run_in_executor(
+            None, fetch_history, ticker, period, interval
+        )
+        history = {"_id": key, "fetched": datetime.utcnow(), **columns}
+        await database.price_history.replace_one({"_id": key}, history, upsert=True)
+        return history
+
+    return await history_flight.do(key, download)
+
+
+def history_frame(history: Dict) -> pd.DataFrame:
+    """
+    load_history columns as yfinance-like dataframe, what ratios.py slices
+    """
+    return pd.DataFrame(
+        {i.capitalize(): history[i] for i in COLUMNS},
+        index=pd.DatetimeIndex(history["date"]),
+    )
+
+
+def downsample(history: Dict, points: int) -> Dict:
+    """
+    Keep LTTB selected rows of close price series
+    """
+    dates = history["date"]
+    x = np.array([i.timestamp() for i in dates])
+    indices = lttb(x, np.array(history["close"]), points)
+    output: Dict[str, List] = {"date": [dates[i].strftime("%Y-%m-%d") for i in indices]}
+    output.update({i: [history[i][j] for j in indices] for i in COLUMNS})
+    return output
@@ -0,0 +1,96 @@
+from typing import Dict, List
+
+import numpy as np
+
+from db import database  # type: ignore
+from models.stocks import RATIO_FIELDS  # type: ignore
+
+# Quantiles a client can ask for, keeps stats cache keys few
+QUANTILES = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+
+
+def ratio_facets(field: str, buckets: int) -> Dict:
+    is_number = {"$isNumber": f"${field}"}
+    return {
+        field: [
+            {
+                "$group": {
+                    "_id": None,
+                    "count": {"$sum": {"$cond": [is_number, 1, 0]}},
+                    "missing": {"$sum": {"$cond": [is_number, 0, 1]}},
+                    "mean": {"$avg": f"${field}"},
+                    "std": {"$stdDevPop": f"${field}"},
+                    "min": {"$min": f"${field}"},
+                    "max": {"$max": f"${field}"},
+                    "values": {"$push": f"${field}"},
+                }
+            }
+        ],
+        f"{field}_histogram": [
+            {"$match": {field: {"$type": "number"}}},
+            {"$bucketAuto": {"groupBy": f"${field}", "buckets": buckets}},
+        ],
+    }
+
+
+def ratio_stats(group: Dict, histogram: List, quantiles: List[float]) -> Dict:
+    """
+    Stats of one ratio from its $group and $bucketAuto facets, group is not changed
+    """
+    values = np.array(
+        [i for i in group["values"] if isinstance(i, (int, float))], dtype=float
+    )
+    stats = {k: v for k, v in group.items() if k not in ("_id", "values")}
+    if len(values):
+        stats["median"] = float(np.median(values))
+        stats["quantiles"] = {
+            str(q): float(v) for q, v in zip(quantiles, np.quantile(values, quantiles))
+        }
+    else:
+        stats["median"] = None
+        stats["quantiles"] = {str(q): None for q in quantiles}
+    stats["histogram"] = [
+        {"min": i["_id"]["min"], "max": i["_id"]["max"], "count": i["count"]}
+        for i in histogram
+    ]
+    return stats
+
+
+async def get_index_stats(
+    index_id: str, buckets: int, quantiles: List[float]
+) -> Dict:
+    """
+    Ratios distribution over index stocks in one $facet aggregation
+    missing -> stocks without numeric ratio value
+    """
+    facets: Dict = {"total": [{"$count": "count"}]}
+    for field in RATIO_FIELDS:
+        facets.update(ratio_facets(field, buckets))
+    result = await database.stocks.aggregate(
+        [{"$match": {"index_id": index_id}}, {"$facet": facets}]
+    ).to_list(None)
+    result = result[0]
+
+    total = result["total"][0]["count"] if result["total"] else 0
+    # $group outputs nothing when no stock matched
+    empty = {
+        "_id": None,
+        "count": 0,
+        "missing": total,
+        "mean": None,
+        "std": None,
+        "min": None,
+        "max": None,
+        "values": [],
+    }
+    return {
+        "count": total,
+        "ratios": {
+            field: ratio_stats(
+                (result[field] or [dict(empty)])[0],
+                result[f"{field}_histogram"],
+                quantiles,
+            )
+            for field in RATIO_FIELDS
+        },
+    }
@@ -0,0 +1,285 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+import uuid
+
+from pymongo import ReturnDocument, UpdateOne
+
+from cache import touch_index  # type: ignore
+from db import database  # type: ignore
+from history import history_frame, load_history  # type: ignore
+from ratios import define_time, get_ratios  # type: ignore
+from settings import Settings  # type: ignore
+
+settings: Any = Settings()
+logger = logging.getLogger(__name__)
+
+# ratios.py is blocking (pandas + network I/O), run it off the event loop
+executor = ThreadPoolExecutor(max_workers=settings.RATIO_WORKERS)
+
+# Shortest cached history period reaching define_time() year ago
+RATIOS_PERIODS = [("2y", 730), ("5y", 1826), ("10y", 3652)]
+
+worker_tasks: List[asyncio.Task] = []
+
+
+def job_key(ticker: str, as_of: Optional[datetime] = None) -> str:
+    """
+    One job per ticker per define_time() window
+    """
+    _, last_month = define_time(as_of)
+    return f"{ticker}:{last_month.strftime('%Y-%m')}"
+
+
+def ratios_record(ticker: str, as_of: Optional[datetime], ratios: Dict) -> UpdateOne:
+    """
+    Upsert of ticker ratios into ratios_history, one document per month
+    """
+    _, last_month = define_time(as_of)
+    return UpdateOne(
+        {"_id": job_key(ticker, as_of)},
+        {
+            "$set": {
+                "ticker": ticker,
+                "period": last_month.strftime("%Y-%m"),
+                "computed": datetime.utcnow(),
+                **ratios,
+            }
+        },
+        upsert=True,
+    )
+
+
+def ratios_period(as_of: Optional[datetime] = None) -> str:
+    year_ago, _ = define_time(as_of)
+    days = (datetime.now() - year_ago).days
+    return next((period for period, size in RATIOS_PERIODS if size > days), "max")
+
+
+async def compute_ratios(ticker: str, as_of: Optional[datetime] = None) -> Dict:
+    """
+    Ratios for ticker, daily and weekly prices come from load_history,
+    downloads are shared with /history and /covariance and cached for the day
+    """
+    period = ratios_period(as_of)
+    daily, weekly = await asyncio.gather(
+        load_history(ticker, period, "1d"), load_history(ticker, period, "1wk")
+    )
+    sources = {"daily": history_frame(daily), "weekly": history_frame(weekly)}
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, get_ratios, ticker, as_of, sources)
+
+
+async def create_job(stocks: List[Dict], as_of: Optional[datetime] = None) -> Dict:
+    """
+    Enqueue ratios jobs for stocks under one batch id
+    tickers already queued, running or done this month are not duplicated
+    as_of: compute ratios of a past month into ratios_history only
+    """
+    batch_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    keys = [job_key(stock["ticker"], as_of) for stock in stocks]
+    operations = [
+        UpdateOne(
+            {"_id": key},
+            {
+                "$setOnInsert": {
+                    "ticker": stock["ticker"],
+                    "as_of": as_of,
+                    "status": "queued",
+                    "attempts": 0,
+                    "available_at": now,
+                    "created": now,
+                },
+                "$addToSet": {"batches": batch_id},
+            },
+            upsert=True,
+        )
+        for key, stock in zip(keys, stocks)
+    ]
+    if operations:
+        await database.jobs.bulk_write(operations, ordered=False)
+    # Retrigger gives failed jobs another round of attempts
+    await database.jobs.update_many(
+        {"_id": {"$in": keys}, "status": "failed"},
+        {"$set": {"status": "queued", "attempts": 0, "available_at": now}},
+    )
+    return {"id": batch_id, "total": len(set(keys))}
+
+
+async def get_job(batch_id: str) -> Optional[Dict]:
+    """
+    Batch progress by jobs status
+    """
+    counts = await database.jobs.aggregate(
+        [
+            {"$match": {"batches": batch_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ]
+    ).to_list(None)
+    if not counts:
+        return None
+    status = {i: 0 for i in ["queued", "running", "done", "failed"]}
+    status.update({i["_id"]: i["count"] for i in counts})
+    failed = await database.jobs.find(
+        {"batches": batch_id, "status": "failed"}, {"ticker": 1, "error": 1}
+    ).to_list(None)
+    return {
+        "id": batch_id,
+        "status": "running" if status["queued"] + status["running"] else "done",
+        "total": sum(status.values()),
+        **status,
+        "errors": {i["ticker"]: i.get("error") for i in failed},
+    }
+
+
+async def claim_job(worker_id: str) -> Optional[Dict]:
+    """
+    Atomically take next queued job or job with expired lease
+    """
+    now = datetime.utcnow()
+    return await database.jobs.find_one_and_update(
+        {
+            "$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker_id,
+                "lease_until": now + timedelta(seconds=settings.JOB_LEASE),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def heartbeat(job: Dict, worker_id: str) -> None:
+    """
+    Extend lease while job is computing
+    """
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE / 3)
+        try:
+            await database.jobs.update_one(
+                {"_id": job["_id"], "worker": worker_id, "status": "running"},
+                {
+                    "$set": {
+                        "lease_until": datetime.utcnow()
+                        + timedelta(seconds=settings.JOB_LEASE)
+                    }
+                },
+            )
+        except Exception as error:
+            # Keep beating, lease is JOB_LEASE so a next beat can still make it
+            logger.warning("Job %s heartbeat failed: %s", job["_id"], error)
+
+
+async def fail_job(job: Dict, worker_id: str, error: str) -> None:
+    """
+    Requeue job with backoff or mark failed after JOB_MAX_ATTEMPTS
+    """
+    if job["attempts"] < settings.JOB_MAX_ATTEMPTS:
+        update = {
+            "status": "queued",
+            "available_at": datetime.utcnow()
+            + timedelta(seconds=settings.JOB_RETRY_DELAY * job["attempts"]),
+        }
+    else:
+        update = {"status": "failed"}
+    await database.jobs.update_one(
+        {"_id": job["_id"], "worker": worker_id},
+        {"$set": {**update, "error": error}},
+    )
+
+
+async def run_job(job: Dict, worker_id: str) -> None:
+    """
+    Compute ratios in executor and write them back to stocks
+    """
+    if job["attempts"] > settings.JOB_MAX_ATTEMPTS:
+        await fail_job(job, worker_id, job.get("error") or "Lease expired.")
+        return
+    beat = asyncio.create_task(heartbeat(job, worker_id))
+    try:
+        as_of = job.get("as_of")
+        ratios = await compute_ratios(job["ticker"], as_of)
+        await database.ratios_history.bulk_write(
+            [ratios_record(job["ticker"], as_of, ratios)]
+        )
+        if as_of is None:
+            await database.stocks.update_many(
+                {"ticker": job["ticker"]}, {"$set": ratios}
+            )
+            index_ids = await database.stocks.distinct(
+                "index_id", {"ticker": job["ticker"]}
+            )
+            await touch_index(*index_ids)
+        await database.jobs.update_one(
+            {"_id": job["_id"], "worker": worker_id},
+            {"$set": {"status": "done", "finished": datetime.utcnow()}},
+        )
+    except asyncio.CancelledError:
+        # Shutdown, let another worker take it right away
+        await database.jobs.update_one(
+            {"_id": job["_id"], "worker": worker_id},
+            {"$set": {"status": "queued"}, "$inc": {"attempts": -1}},
+        )
+        raise
+    except Exception as error:
+        logger.warning("Job %s failed: %s", job["_id"], error)
+        await fail_job(job, worker_id, str(error))
+    finally:
+        beat.cancel()
+
+
+async def worker(worker_id: str) -> None:
+    """
+    Claim loop, database errors are logged and retried, only cancel stops it
+    """
+    while True:
+        try:
+            job = await claim_job(worker_id)
+            if job is None:
+                await asyncio.sleep(settings.JOB_POLL)
+                continue
+            await run_job(job, worker_id)
+        except Exception as error:
+            logger.warning("Worker %s failed: %s", worker_id, error)
+            await asyncio.sleep(settings.JOB_POLL)
+
+
+def start_workers(number: int) -> None:
+    prefix = f"{os.uname().nodename}:{os.getpid()}"
+    for i in range(number):
+        worker_tasks.append(asyncio.create_task(worker(f"{prefix}:{i}")))
+
+
+async def stop_workers() -> None:
+    for task in worker_tasks:
+        task.cancel()
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+    worker_tasks.clear()
+
+
+async def run_workers() -> None:
+    """
+    Standalone worker process: python jobs.py
+    """
+    logging.basicConfig(level=logging.INFO)
+    start_workers(settings.RATIO_WORKERS)
+    try:
+        await asyncio.gather(*worker_tasks)
+    finally:
+        await stop_workers()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_workers())
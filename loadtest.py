@@ -0,0 +1,246 @@
+"""
+Load test for main:app
+
+Seed synthetic universe into a separate database, then start the server
+on it with DATABASE_NAME=investments_loadtest:
+    python loadtest.py seed --database mongodb://localhost:27017 --indexes 5 --stocks 500
+
+Run endpoint mix against running server and save/compare baseline:
+    python loadtest.py run --backend http://127.0.0.1:8000 --concurrency 50 --duration 30
+    python loadtest.py run --rate 500 --save baseline.json
+    python loadtest.py run --compare baseline.json
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+import httpx
+import motor.motor_asyncio
+import numpy as np
+
+# route name -> weight, route names are the keys of the report
+DEFAULT_MIX = "list=4,stock=3,ticker=3,snapshot=1,stats=1,search=2,batch=1"
+
+# Synthetic tickers, LT0.. stocks and LTI0.. indexes, never real ones like LTC
+STOCK_TICKER = r"^LT\d+$"
+INDEX_TICKER = r"^LTI\d+$"
+
+
+def synthetic_stock(index_id: str, number: int) -> Dict:
+    return {
+        "name": f"Loadtest Company {number}",
+        "ticker": f"LT{number}",
+        "index_id": index_id,
+        "loadtest": True,
+        "momentum_12_2": round(random.gauss(0.1, 0.3), 3),
+        "momentum_avg": round(random.gauss(1.05, 0.2), 2),
+        "e_p": round(random.gauss(0.06, 0.04), 3),
+        "ma_10": random.randint(0, 1),
+        "div_p": round(abs(random.gauss(0.02, 0.02)), 3),
+    }
+
+
+async def seed(database_url: str, name: str, indexes: int, stocks: int) -> None:
+    """
+    Replace previous loadtest data with indexes x stocks synthetic universe
+    only documents seeded here are deleted, marked and with synthetic tickers
+    """
+    database = motor.motor_asyncio.AsyncIOMotorClient(database_url)[name]
+    await database.stocks.delete_many(
+        {"loadtest": True, "ticker": {"$regex": STOCK_TICKER}}
+    )
+    await database.indexes.delete_many(
+        {"loadtest": True, "ticker": {"$regex": INDEX_TICKER}}
+    )
+    number = 0
+    for i in range(indexes):
+        index = await database.indexes.insert_one(
+            {"name": f"Loadtest Index {i}", "ticker": f"LTI{i}", "loadtest": True}
+        )
+        batch = []
+        for _ in range(stocks):
+            batch.append(synthetic_stock(str(index.inserted_id), number))
+            number += 1
+        await database.stocks.insert_many(batch)
+    print(f"Seeded {indexes} indexes, {number} stocks")
+
+
+class Universe:
+    """
+    Loadtest indexes and stocks known to the server, picked at random
+    """
+
+    def __init__(self, indexes: List[str], stocks: List[Dict]) -> None:
+        self.indexes = indexes
+        self.stocks = stocks
+
+    def request(self, route: str) -> Tuple[str, str, Optional[Dict]]:
+        stock = random.choice(self.stocks)
+        index = random.choice(self.indexes)
+        if route == "list":
+            return "GET", f"/api/stocks/{index}", None
+        if route == "stock":
+            return "GET", f"/api/stocks/stock/{stock['id']}", None
+        if route == "ticker":
+            return "GET", f"/api/stocks/stock/ticker/{stock['ticker']}", None
+        if route == "snapshot":
+            return "GET", f"/api/stocks/{index}/snapshot", None
+        if route == "stats":
+            return "GET", f"/api/stocks/{index}/stats", None
+        if route == "search":
+            return "GET", f"/api/search?q={stock['ticker'][:random.randint(2, 4)]}", None
+        if route == "batch":
+            batch = random.sample(self.stocks, min(50, len(self.stocks)))
+            tickers = [i["ticker"] for i in batch]
+            return "POST", "/api/stocks/batch", {"tickers": tickers}
+        raise ValueError(f"Unknown route: {route}")
+
+
+async def load_universe(client: httpx.AsyncClient) -> Universe:
+    r = await client.get("/api/indexes/list")
+    indexes = [i["ticker"] for i in r.json() if re.match(INDEX_TICKER, i["ticker"])]
+    if not indexes:
+        raise SystemExit("No loadtest indexes, run: python loadtest.py seed")
+    stocks: List[Dict] = []
+    for index in indexes:
+        r = await client.get(f"/api/stocks/{index}/snapshot")
+        snapshot = r.json()
+        stocks += [
+            {"id": i, "ticker": t} for i, t in zip(snapshot["id"], snapshot["ticker"])
+        ]
+    return Universe(indexes, stocks)
+
+
+async def run(
+    backend: str,
+    mix: Dict[str, int],
+    concurrency: int,
+    duration: float,
+    rate: Optional[float],
+) -> Dict:
+    """
+    Closed loop with concurrency workers, or open loop at rate req/s
+    latency of open loop is measured from scheduled time (no coordinated omission)
+    """
+    latencies: Dict[str, List[float]] = {i: [] for i in mix}
+    errors: Dict[str, int] = {i: 0 for i in mix}
+    routes, weights = list(mix), list(mix.values())
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=backend, limits=limits, timeout=30) as client:
+        universe = await load_universe(client)
+
+        async def call(route: str, scheduled: float) -> None:
+            method, url, body = universe.request(route)
+            try:
+                r = await client.request(method, url, json=body)
+                if r.status_code >= 400:
+                    errors[route] += 1
+            except httpx.HTTPError:
+                errors[route] += 1
+            latencies[route].append(time.perf_counter() - scheduled)
+
+        start = time.perf_counter()
+        end = start + duration
+        if rate:
+            tasks = []
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def limited(route: str, scheduled: float) -> None:
+                async with semaphore:
+                    await call(route, scheduled)
+
+            scheduled = start
+            while scheduled < end:
+                await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+                route = random.choices(routes, weights)[0]
+                tasks.append(asyncio.create_task(limited(route, scheduled)))
+                scheduled += 1 / rate
+            await asyncio.gather(*tasks)
+        else:
+
+            async def worker() -> None:
+                while time.perf_counter() < end:
+                    await call(random.choices(routes, weights)[0], time.perf_counter())
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    report = {}
+    for route, values in latencies.items():
+        if not values:
+            continue
+        ms = np.array(values) * 1000
+        report[route] = {
+            "requests": len(values),
+            "errors": errors[route],
+            "rps": round(len(values) / elapsed, 1),
+            "p50": round(float(np.percentile(ms, 50)), 2),
+            "p90": round(float(np.percentile(ms, 90)), 2),
+            "p99": round(float(np.percentile(ms, 99)), 2),
+            "max": round(float(ms.max()), 2),
+        }
+    return report
+
+
+def print_report(report: Dict, baseline: Optional[Dict] = None) -> None:
+    columns = ["requests", "errors", "rps", "p50", "p90", "p99", "max"]
+    print(f"{'route':<10}" + "".join(f"{i:>18}" for i in columns))
+    for route, row in report.items():
+        cells = []
+        for column in columns:
+            cell = f"{row[column]}"
+            base = (baseline or {}).get(route, {}).get(column)
+            if base:
+                cell += f" ({(row[column] - base) / base:+.0%})"
+            cells.append(f"{cell:>18}")
+        print(f"{route:<10}" + "".join(cells))
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    return {k: int(v) for k, v in (i.split("=") for i in mix.split(","))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="main:app load test")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed")
+    seed_parser.add_argument("--database", default="mongodb://localhost:27017")
+    seed_parser.add_argument("--database-name", default="investments_loadtest")
+    seed_parser.add_argument("--indexes", type=int, default=5)
+    seed_parser.add_argument("--stocks", type=int, default=500)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--backend", default="http://127.0.0.1:8000")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX)
+    run_parser.add_argument("--concurrency", type=int, default=50)
+    run_parser.add_argument("--duration", type=float, default=30)
+    run_parser.add_argument("--rate", type=float, help="Open loop req/s")
+    run_parser.add_argument("--save", help="Write report as baseline json")
+    run_parser.add_argument("--compare", help="Baseline json to compare with")
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        asyncio.run(seed(args.database, args.database_name, args.indexes, args.stocks))
+        return
+
+    report = asyncio.run(
+        run(args.backend, parse_mix(args.mix), args.concurrency, args.duration, args.rate)
+    )
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,57 @@
+import logging
+import os
+import sys
+
 from fastapi import FastAPI
 import uvicorn
 
+from db import client, create_indexes
+from jobs import start_workers, stop_workers
+from middleware import CompressionMiddleware
+from search import start_search_index, stop_search_index
 from routers.indexes import indexes_router
+from routers.jobs import jobs_router
+from routers.search import search_router
 from routers.stocks import stocks_router
+from settings import Settings
+
 
+settings = Settings()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESS_MIN_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
 
 
 app.include_router(indexes_router, prefix="/api/indexes", tags="indexes")
 app.include_router(stocks_router, prefix="/api/stocks", tags="stocks")
+app.include_router(jobs_router, prefix="/api/jobs", tags="jobs")
+app.include_router(search_router, prefix="/api/search", tags="search")
+
+
+@app.on_event("startup")
+async def startup_worker() -> None:
+    """
+    Runs once in every worker process
+    """
+    await client.admin.command("ping")
+    await create_indexes()
+    start_workers(settings.JOB_WORKERS)
+    await start_search_index()
+    logger.info("Worker %s connected to database", os.getpid())
+
+
+@app.on_event("shutdown")
+async def shutdown_worker() -> None:
+    await stop_workers()
+    await stop_search_index()
+    client.close()
+    logger.info("Worker %s stopped", os.getpid())
 
 
 @app.get("/", tags=["Root"])
@@ -17,5 +59,33 @@ async def read_root():
     return {"message": "Investment app!"}
 
 
+def run_dev() -> None:
+    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+
+
+def run_production() -> None:
+    """
+    Multi-worker server
+    uvloop and httptools are used when installed (uvicorn[standard])
+    in-flight requests are drained for GRACEFUL_TIMEOUT seconds on shutdown
+    """
+    uvicorn.run(
+        "main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=settings.WORKERS or os.cpu_count() or 1,
+        loop="auto",
+        http="auto",
+        timeout_keep_alive=settings.KEEP_ALIVE,
+        backlog=settings.BACKLOG,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT,
+        access_log=settings.ACCESS_LOG,
+        proxy_headers=True,
+    )
+
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    if "--prod" in sys.argv:
+        run_production()
+    else:
+        run_dev()
\ No newline at end of file
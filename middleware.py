@@ -0,0 +1,134 @@
+from typing import Any, Optional
+import zlib
+
+import brotli  # type: ignore
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Events are flushed one by one, they must not wait in compressor
+STREAM_MEDIA_TYPES = ("text/event-stream",)
+
+# Already compressed inside (parquet column chunks), compressing again only costs CPU
+COMPRESSED_MEDIA_TYPES = ("application/vnd.apache.parquet",)
+
+SKIP_MEDIA_TYPES = STREAM_MEDIA_TYPES + COMPRESSED_MEDIA_TYPES
+
+
+class Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor: Any = brotli.Compressor(quality=brotli_quality)
+        else:
+            self.compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self.compressor.process(data) + self.compressor.finish()
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    br preferred over gzip, q=0 means not acceptable
+    """
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.strip())
+    for encoding in ("br", "gzip"):
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    brotli or gzip response compression above minimum_size bytes,
+    streamed responses are compressed chunk by chunk
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = None
+        if scope["type"] == "http":
+            encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(
+            send,
+            Compressor(encoding, self.gzip_level, self.brotli_quality),
+            self.minimum_size,
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, send: Send, compressor: Compressor, minimum_size: int) -> None:
+        self.next_send = send
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.compress = True
+        self.streaming = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Headers go out with first body chunk, when size is known
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.compress = "content-encoding" not in headers and not headers.get(
+                "content-type", ""
+            ).startswith(SKIP_MEDIA_TYPES)
+            return
+        if message["type"] != "http.response.body":
+            await self.next_send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.streaming:
+            body = self.compressor.compress(body) if more_body else self.compressor.finish(body)
+        elif self.start is None:
+            # Decided on first chunk not to compress
+            await self.next_send(message)
+            return
+        else:
+            start, self.start = self.start, None
+            if not self.compress or (not more_body and len(body) < self.minimum_size):
+                await self.next_send(start)
+                await self.next_send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.compressor.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                self.streaming = True
+                body = self.compressor.compress(body)
+            else:
+                body = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(body))
+            await self.next_send(start)
+        await self.next_send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
@@ -1,6 +1,8 @@
-from typing import Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel, StrictStr
+from pydantic import BaseModel, Field, StrictStr, conlist, validator
+
+RATIO_FIELDS = ["momentum_12_2", "momentum_avg", "e_p", "ma_10", "div_p"]
 
 
 class Stocks(BaseModel):
@@ -33,3 +35,52 @@ class StocksUpdate(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class StocksBatch(BaseModel):
+    tickers: conlist(StrictStr, max_items=1000) = []  # type: ignore
+    ids: conlist(str, max_items=1000) = []  # type: ignore
+    fields: Optional[List[str]]
+
+    @validator("fields")
+    def known_fields(cls, fields):
+        if not fields:
+            return fields
+        unknown = set(fields) - set(Stocks.__fields__)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return fields
+
+
+class RatioFilter(BaseModel):
+    gt: Optional[float]
+    gte: Optional[float]
+    lt: Optional[float]
+    lte: Optional[float]
+    eq: Optional[float]
+    ne: Optional[float]
+
+
+class StocksScreener(BaseModel):
+    indexes: List[StrictStr] = []
+    filters: Dict[str, RatioFilter] = {}
+    sort_by: str = "momentum_12_2"
+    desc: bool = True
+    limit: int = Field(default=20, gt=0, le=1000)
+    explain: bool = False
+
+    @validator("filters")
+    def ratio_filters(cls, filters):
+        unknown = set(filters) - set(RATIO_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown ratios: {', '.join(sorted(unknown))}")
+        empty = [k for k, v in filters.items() if not v.dict(exclude_none=True)]
+        if empty:
+            raise ValueError(f"Empty filters: {', '.join(sorted(empty))}")
+        return filters
+
+    @validator("sort_by")
+    def ratio_sort(cls, sort_by):
+        if sort_by not in RATIO_FIELDS:
+            raise ValueError(f"Unknown ratio: {sort_by}")
+        return sort_by
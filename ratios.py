@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from typing import Optional
 import urllib.request
 import urllib.parse
 import urllib.error
@@ -10,44 +11,81 @@ import yfinance as yf  # type: ignore
 from dateutil.relativedelta import relativedelta
 
 
-def define_time() -> tuple:
+def define_time(as_of: Optional[datetime] = None) -> tuple:
     """
     Define time period
-    from 28th last ended month
+    from 28th last ended month before as_of (now by default)
     to 12 months back
     """
-    start_month = datetime.now().replace(day=28)
+    start_month = (as_of or datetime.now()).replace(day=28)
     last_month = start_month + relativedelta(months=-1)
     year_ago = last_month + relativedelta(months=-12)
     return year_ago, last_month
 
 
-def get_history(ticker: str, interval: str = "1d") -> pd.DataFrame:
+def slice_time(series, start: Optional[datetime], end: datetime):
     """
-    Get ticker price history for last 12 months
+    Rows of prefetched series/dataframe in [start, end)
     """
+    end = pd.Timestamp(end).tz_localize(series.index.tz)
+    rows = series.index < end
+    if start is not None:
+        rows &= series.index >= pd.Timestamp(start).tz_localize(series.index.tz)
+    return series[rows]
+
+
+def get_history(
+    ticker: str,
+    interval: str = "1d",
+    as_of: Optional[datetime] = None,
+    history: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    Get ticker price history for 12 months before as_of
+    history: prefetched longer history of the same interval, sliced instead of download
+    """
+    start_period, end_period = define_time(as_of)
+    if history is not None:
+        return slice_time(history, start_period, end_period)
     ticker = yf.Ticker(ticker)
-    start_period, end_period = define_time()
     ticker_history = ticker.history(
         start=start_period, end=end_period, interval=interval
     )
     return ticker_history
 
 
-def momentum_12(ticker: str, period: int = -1) -> float:
+def get_price_history(
+    ticker: str, period: str = "10y", interval: str = "1d"
+) -> pd.DataFrame:
+    """
+    Get ticker OHLCV history for yfinance period, e.g. 1y, 10y, max
+    """
+    return yf.Ticker(ticker).history(period=period, interval=interval)
+
+
+def momentum_12(
+    ticker: str,
+    period: int = -1,
+    as_of: Optional[datetime] = None,
+    history: Optional[pd.DataFrame] = None,
+) -> float:
     """
     Momentum_12_1 -> last ended month(28th) close price / close price year ago
     """
-    series = get_history(ticker)
+    series = get_history(ticker, as_of=as_of, history=history)
     momentum = (series["Close"][period] / series["Close"][0]) - 1
     return round(momentum, 3)
 
 
-def momentum_avg(ticker: str) -> float:
+def momentum_avg(
+    ticker: str,
+    as_of: Optional[datetime] = None,
+    history: Optional[pd.DataFrame] = None,
+) -> float:
     """
     Returns momentum average for 3, 6, 12 previous months
     """
-    series = get_history(ticker)
+    series = get_history(ticker, as_of=as_of, history=history)
     momentum_3 = series["Close"][-1] / series["Close"][-66]
     momentum_6 = series["Close"][-1] / series["Close"][-132]
     momentum_12_ = series["Close"][-1] / series["Close"][0]
@@ -55,13 +93,21 @@ def momentum_avg(ticker: str) -> float:
     return round(mom_avg, 2)
 
 
-def div_p(ticker: str) -> float:
+def div_p(
+    ticker: str,
+    as_of: Optional[datetime] = None,
+    history: Optional[pd.DataFrame] = None,
+    dividends: Optional[pd.Series] = None,
+) -> float:
     """
     Returns average dividends / last ended month(28th) close price
     """
-    series = get_history(ticker)
-    share = yf.Ticker(ticker)
-    divs = share.dividends[-16:].mean()
+    series = get_history(ticker, as_of=as_of, history=history)
+    if dividends is None:
+        dividends = yf.Ticker(ticker).dividends
+    if as_of is not None:
+        dividends = slice_time(dividends, None, define_time(as_of)[1])
+    divs = dividends[-16:].mean()
     last_close = series["Close"][-1]
     dividends_price = round(divs / last_close, 3)
     if math.isnan(dividends_price):
@@ -77,9 +123,9 @@ def get_shares(ticker: str) -> float:
     return shares_outstanding
 
 
-def e_p(ticker: str) -> float:
+def get_income(ticker: str) -> list:
     """
-    Returns average income(fcf) for last 4 years / price
+    Returns [(statement end date, net income)] of last 4 annual statements
     """
     url = (
         f"https://query2.finance.yahoo.com/v10/finance/quoteSummary/{ticker}?modules=incomeStatementHistory"
@@ -87,24 +133,90 @@ def e_p(ticker: str) -> float:
     fhand = urllib.request.urlopen(url).read()
     data = json.loads(fhand)
     income_statements = data["quoteSummary"]["result"][0]["incomeStatementHistory"]["incomeStatementHistory"]
-    income_for_last_4_years = [i["netIncome"]["raw"] for i in income_statements]
-
-    shares = get_shares(ticker)
-    earning_per_share = (sum(income_for_last_4_years) / 4) / shares
-    series = get_history(ticker)
+    return [
+        (datetime.utcfromtimestamp(i["endDate"]["raw"]), i["netIncome"]["raw"])
+        for i in income_statements
+    ]
+
+
+def e_p(
+    ticker: str,
+    as_of: Optional[datetime] = None,
+    history: Optional[pd.DataFrame] = None,
+    income: Optional[list] = None,
+    shares: Optional[float] = None,
+) -> Optional[float]:
+    """
+    Returns average income(fcf) for last 4 years / price
+    as_of: only statements ended before last ended month are averaged,
+    Yahoo keeps 4 latest statements and current shares outstanding,
+    None if no statement ended before it
+    """
+    if income is None:
+        income = get_income(ticker)
+    if shares is None:
+        shares = get_shares(ticker)
+    if as_of is not None:
+        income = [i for i in income if i[0] < define_time(as_of)[1]]
+    income_for_last_4_years = [i[1] for i in income][:4]
+    if not income_for_last_4_years:
+        return None
+    years = 4 if as_of is None else len(income_for_last_4_years)
+
+    earning_per_share = (sum(income_for_last_4_years) / years) / shares
+    series = get_history(ticker, as_of=as_of, history=history)
     average_earnings_per_share = earning_per_share / series["Close"][-1]
 
     return round(average_earnings_per_share, 3)
 
 
-def ma_10(ticker: str) -> int:
+def ma_10(
+    ticker: str,
+    as_of: Optional[datetime] = None,
+    history: Optional[pd.DataFrame] = None,
+) -> int:
     """
     Returns 1 if last month close price above MA_10, 0 if below
+    history: prefetched weekly history
     """
-    series = get_history(ticker, "1wk")
+    series = get_history(ticker, "1wk", as_of=as_of, history=history)
     end_days = ["25", "26", "27", "28", "29", "30", "31"]
     day_data = [series.loc[i]["Close"] for i in series.index if str(i.day) in end_days]
     average_10m_price = sum(day_data[3:]) / 10
     last_close_price = series["Close"][-1]
     ma10_status = 1 if last_close_price > average_10m_price else 0
     return ma10_status
+
+
+def get_sources(ticker: str, start: datetime, end: datetime) -> dict:
+    """
+    Download everything ratios need for as_of dates from start to end once
+    """
+    share = yf.Ticker(ticker)
+    year_ago, _ = define_time(start)
+    _, last_month = define_time(end)
+    return {
+        "daily": share.history(start=year_ago, end=last_month, interval="1d"),
+        "weekly": share.history(start=year_ago, end=last_month, interval="1wk"),
+        "dividends": share.dividends,
+        "income": get_income(ticker),
+        "shares": get_shares(ticker),
+    }
+
+
+def get_ratios(
+    ticker: str, as_of: Optional[datetime] = None, sources: Optional[dict] = None
+) -> dict:
+    """
+    Returns all Stocks ratio fields for ticker
+    sources: get_sources() result covering as_of, no downloads then
+    """
+    sources = sources or {}
+    daily = sources.get("daily")
+    return {
+        "momentum_12_2": momentum_12(ticker, -2, as_of, daily),
+        "momentum_avg": momentum_avg(ticker, as_of, daily),
+        "e_p": e_p(ticker, as_of, daily, sources.get("income"), sources.get("shares")),
+        "ma_10": ma_10(ticker, as_of, sources.get("weekly")),
+        "div_p": div_p(ticker, as_of, daily, sources.get("dividends")),
+    }
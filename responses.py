@@ -0,0 +1,27 @@
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+import msgpack  # type: ignore
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=str)
+
+
+def negotiate(request: Request, content: Any) -> Response:
+    """
+    MessagePack body if client accepts it, JSON otherwise
+    content must be plain dicts/lists, no pydantic models
+    """
+    accept = request.headers.get("accept", "")
+    # Caches must key on Accept, same url has two bodies
+    headers = {"Vary": "Accept"}
+    if any(i in accept for i in MSGPACK_MEDIA_TYPES):
+        return MsgPackResponse(content, headers=headers)
+    return JSONResponse(content, headers=headers)
@@ -1,12 +1,15 @@
-from typing import Any, Optional, Dict, List
+from typing import Any, Optional, Dict
 import logging
 
-from fastapi import APIRouter, HTTPException, Body, Depends
+from fastapi import APIRouter, HTTPException, Body, Depends, Request
+from fastapi.responses import Response
 from fastapi.security import APIKeyHeader
 from bson import ObjectId  # type: ignore
 
 from models.indexes import Indexes, IndexesDB, IndexUpdate  # type: ignore
 from db import database  # type: ignore
+from responses import negotiate  # type: ignore
+from search import search_index  # type: ignore
 from settings import Settings  # type: ignore
 
 settings: Any = Settings()
@@ -40,6 +43,7 @@ async def create_index(index: Indexes, token: str = Depends(api_admin_header)) -
         raise HTTPException(status_code=409, detail="Index already exists.")
     new_index = await database.indexes.insert_one(index.dict())
     refresh_index = await database.indexes.find_one({"_id": new_index.inserted_id})
+    search_index.add("index", refresh_index)
     index_output = IndexesDB(**refresh_index, id=str(refresh_index["_id"]))
     return index_output.dict()
 
@@ -54,6 +58,7 @@ async def update_index(
         {"_id": index_db["_id"]}, {"$set": index.dict(exclude_unset=True)}
     )
     refresh_index = await database.indexes.find_one({"_id": index_db["_id"]})
+    search_index.add("index", refresh_index)
     index_output = IndexesDB(**refresh_index, id=str(refresh_index["_id"]))
     return index_output.dict()
 
@@ -77,14 +82,16 @@ async def delete_index(id: str, token: str = Depends(api_admin_header)) -> Dict:
     await check_admin(token)
     index_db = await get_index_or_404(id)
     await database.indexes.delete_one({"_id": index_db["_id"]})
+    search_index.remove(id)
     return {"deleted": id}
 
 
 @indexes_router.get("/list")
 async def get_indexes_list(
+    request: Request,
     start: int = Body(embed=True, default=0),
     limit: int = Body(embed=True, default=20),
-) -> List:
+) -> Response:
     """
     start
     limit
@@ -94,5 +101,5 @@ async def get_indexes_list(
     search
     """
     indexes_list = await database.indexes.find({}).to_list(length=None)
-    indexes_output = [IndexesDB(**i, id=str(i["_id"])) for i in indexes_list]
-    return indexes_output
+    indexes_output = [IndexesDB(**i, id=str(i["_id"])).dict() for i in indexes_list]
+    return negotiate(request, indexes_output)
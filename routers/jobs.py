@@ -0,0 +1,30 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException
+
+from covariance import covariance_flight  # type: ignore
+from history import history_flight  # type: ignore
+from jobs import get_job  # type: ignore
+
+jobs_router: Any = APIRouter()
+
+
+@jobs_router.get("/metrics")
+async def get_jobs_metrics() -> Dict:
+    """
+    Shared upstream work of this worker process, price history downloads
+    (refresh jobs, /history, /covariance) and covariance builds
+    coalesced -> calls that joined work already in flight
+    """
+    return {"history": history_flight.stats(), "covariance": covariance_flight.stats()}
+
+
+@jobs_router.get("/{job_id}")
+async def get_job_status(job_id: str) -> Dict:
+    """
+    Ratios refresh batch progress
+    """
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
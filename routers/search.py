@@ -0,0 +1,19 @@
+from typing import Any, List, Optional
+
+from fastapi import APIRouter, Query
+
+from search import search_index  # type: ignore
+
+search_router: Any = APIRouter()
+
+
+@search_router.get("")
+async def search(
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=10, gt=0, le=100),
+    kind: Optional[str] = Query(default=None, regex="^(stock|index)$"),
+) -> List:
+    """
+    Autocomplete stocks and indexes by ticker, name or name word prefix
+    """
+    return search_index.search(q, limit, kind)
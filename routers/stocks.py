@@ -1,12 +1,32 @@
-from typing import Any, Optional, Dict, List
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Optional, Dict, List
+import json
 
-from fastapi import APIRouter, HTTPException, Body, Depends
+from fastapi import APIRouter, HTTPException, Body, Depends, Header, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import APIKeyHeader
 from bson import ObjectId  # type: ignore
 
+from cache import get_cached, set_cached, touch_index  # type: ignore
+from covariance import get_covariance  # type: ignore
 from db import database  # type: ignore
-from models.stocks import Stocks, StocksDB, StocksUpdate  # type: ignore
+from export import MEDIA_TYPES, export_stocks  # type: ignore
+from history import INTERVALS, PERIODS, downsample, load_history  # type: ignore
+from index_stats import QUANTILES, get_index_stats  # type: ignore
+from jobs import create_job  # type: ignore
+from models.stocks import (  # type: ignore
+    Stocks,
+    StocksBatch,
+    StocksDB,
+    StocksScreener,
+    StocksUpdate,
+)
+from ratios import define_time  # type: ignore
+from responses import negotiate  # type: ignore
+from search import search_index  # type: ignore
 from settings import Settings  # type: ignore
+from snapshots import get_snapshot  # type: ignore
+from timeseries import correlation, shrink  # type: ignore
 
 settings: Any = Settings()
 
@@ -29,6 +49,18 @@ async def get_stock_or_404(stock_id: str) -> Stocks:
     return stock_db
 
 
+def as_of_datetime(as_of: Optional[date]) -> Optional[datetime]:
+    if as_of is None:
+        return None
+    if as_of > date.today():
+        raise HTTPException(status_code=422, detail="as_of is in the future.")
+    as_of_time = datetime.combine(as_of, datetime.min.time())
+    if define_time(as_of_time)[1].date() == define_time()[1].date():
+        # Same month as current refresh, update stocks as well
+        return None
+    return as_of_time
+
+
 async def get_index_or_404(index_ticker: str) -> Dict:
     index_db = await database.indexes.find_one({"ticker": index_ticker})
     if index_db is None:
@@ -60,7 +92,9 @@ async def create_stock(stock: Stocks, token: str = Depends(api_admin_header)) ->
         raise HTTPException(status_code=409, detail="Cant find index.")
 
     new_stock = await database.stocks.insert_one(stock.dict(exclude_unset=True))
+    await touch_index(stock.index_id)
     refresh_stock = await database.stocks.find_one({"_id": new_stock.inserted_id})
+    search_index.add("stock", refresh_stock)
     stock_output = StocksDB(**refresh_stock, id=str(refresh_stock["_id"]))
 
     return stock_output.dict(exclude_unset=True)
@@ -87,7 +121,9 @@ async def update_stock(
         {"_id": stock_db["_id"]},
         {"$set": stock.dict(exclude_unset=True)},
     )
+    await touch_index(stock_db["index_id"], stock.index_id)
     stock_refresh = await database.stocks.find_one({"_id": stock_db["_id"]})
+    search_index.add("stock", stock_refresh)
     stock_output = StocksDB(**stock_refresh, id=str(stock_refresh["_id"]))
 
     return stock_output.dict(exclude_unset=True)
@@ -109,10 +145,110 @@ async def get_stock_by_ticker(ticker: str) -> Dict:
     Get stock data by ticker
     """
     stock_db = await database.stocks.find_one({"ticker": ticker})
+    if stock_db is None:
+        raise HTTPException(status_code=404, detail="Stock not found.")
     stock_output = StocksDB(**stock_db, id=str(stock_db["_id"]))
     return stock_output.dict(exclude_unset=True)
 
 
+@stocks_router.get("/stock/{id}/history")
+async def get_stock_history(
+    id: str,
+    period: str = Query(default="1y", regex=f"^({'|'.join(PERIODS)})$"),
+    interval: str = Query(default="1d", regex=f"^({'|'.join(INTERVALS)})$"),
+    points: int = Query(default=500, ge=3, le=10000),
+) -> Dict:
+    """
+    Stock OHLCV history, cached daily, downsampled to points rows with LTTB
+    over close price
+    """
+    stock_db = await get_stock_or_404(id)
+    history = await load_history(stock_db["ticker"], period, interval)
+    return {
+        "ticker": stock_db["ticker"],
+        "period": period,
+        "interval": interval,
+        "total": len(history["date"]),
+        **downsample(history, points),
+    }
+
+
+@stocks_router.post("/batch")
+async def get_stocks_batch(batch: StocksBatch) -> Dict:
+    """
+    Stocks by many tickers and/or ids in one query
+    fields: optional list of fields to return, id is always returned
+    """
+    object_ids = [ObjectId(i) for i in batch.ids if ObjectId.is_valid(i)]
+    projection = {i: 1 for i in batch.fields + ["ticker"]} if batch.fields else None
+    stocks_db = await database.stocks.find(
+        {"$or": [{"ticker": {"$in": batch.tickers}}, {"_id": {"$in": object_ids}}]},
+        projection,
+    ).to_list(None)
+
+    if batch.fields:
+        stocks_output = [
+            {"id": str(i["_id"]), **{k: i.get(k) for k in batch.fields}}
+            for i in stocks_db
+        ]
+    else:
+        stocks_output = [
+            StocksDB(**i, id=str(i["_id"])).dict(exclude_unset=True) for i in stocks_db
+        ]
+    found_tickers = {i["ticker"] for i in stocks_db}
+    found_ids = {str(i["_id"]) for i in stocks_db}
+    return {
+        "stocks": stocks_output,
+        "not_found": {
+            "tickers": [i for i in batch.tickers if i not in found_tickers],
+            "ids": [i for i in batch.ids if i not in found_ids],
+        },
+    }
+
+
+@stocks_router.post("/screener")
+async def screen_stocks(screener: StocksScreener) -> Dict:
+    """
+    Stocks by ratio predicates across indexes, sorted and limited in Mongo
+    indexes: index tickers, all stocks if empty
+    filters: {"e_p": {"gt": 0.08}, "ma_10": {"eq": 1}}
+    explain: return query and winning plan
+    """
+    query: Dict = {}
+    if screener.indexes:
+        indexes_db = await database.indexes.find(
+            {"ticker": {"$in": screener.indexes}}, {"ticker": 1}
+        ).to_list(None)
+        unknown = set(screener.indexes) - {i["ticker"] for i in indexes_db}
+        if unknown:
+            raise HTTPException(
+                status_code=404, detail=f"Index not found: {', '.join(sorted(unknown))}"
+            )
+        query["index_id"] = {"$in": [str(i["_id"]) for i in indexes_db]}
+    for field, ratio_filter in screener.filters.items():
+        query[field] = {
+            f"${operator}": value
+            for operator, value in ratio_filter.dict(exclude_none=True).items()
+        }
+
+    cursor = (
+        database.stocks.find(query)
+        .sort(screener.sort_by, -1 if screener.desc else 1)
+        .limit(screener.limit)
+    )
+    stocks_db = await cursor.to_list(None)
+    stocks_output: Dict = {
+        "stocks": [
+            StocksDB(**i, id=str(i["_id"])).dict(exclude_unset=True) for i in stocks_db
+        ]
+    }
+    if screener.explain:
+        plan = await cursor.clone().explain()
+        stocks_output["query"] = query
+        stocks_output["plan"] = plan["queryPlanner"]["winningPlan"]
+    return stocks_output
+
+
 @stocks_router.delete("/stock/{id}")
 async def delete_stock(id: str, token: str = Depends(api_admin_header)) -> Dict:
     """
@@ -121,16 +257,257 @@ async def delete_stock(id: str, token: str = Depends(api_admin_header)) -> Dict:
     await check_admin(token)
     stock_db = await get_stock_or_404(id)
     await database.stocks.delete_one({"_id": stock_db["_id"]})
+    await touch_index(stock_db["index_id"])
+    search_index.remove(id)
     return {"deleted": id}
 
 
+@stocks_router.post("/stock/{id}/refresh")
+async def refresh_stock(
+    id: str,
+    as_of: Optional[date] = Query(default=None),
+    token: str = Depends(api_admin_header),
+) -> Dict:
+    """
+    Enqueue ratios refresh for stock, progress at GET /api/jobs/<job_id>
+    as_of: compute ratios as of past date into ratios history only
+    """
+    await check_admin(token)
+    stock_db = await get_stock_or_404(id)
+    job = await create_job([stock_db], as_of_datetime(as_of))
+    return {"job_id": job["id"], "total": job["total"]}
+
+
+@stocks_router.post("/{index}/refresh")
+async def refresh_index_stocks(
+    index: str,
+    as_of: Optional[date] = Query(default=None),
+    token: str = Depends(api_admin_header),
+) -> Dict:
+    """
+    Enqueue ratios refresh for all index stocks, progress at GET /api/jobs/<job_id>
+    as_of: compute ratios as of past date into ratios history only
+    """
+    await check_admin(token)
+    index_db = await get_index_or_404(index)
+    stocks_db = await database.stocks.find(
+        {"index_id": str(index_db["_id"])}, {"ticker": 1}
+    ).to_list(None)
+    job = await create_job(stocks_db, as_of_datetime(as_of))
+    return {"job_id": job["id"], "total": job["total"]}
+
+
+def stock_event(change: Dict, index_id: str, ids: set) -> Optional[Dict]:
+    """
+    Changed fields of stock from change stream event
+    None if change is not related to index
+    """
+    stock_id = change["documentKey"]["_id"]
+    operation = change["operationType"]
+    if operation == "delete" or (
+        change.get("fullDocument") or {}
+    ).get("index_id") != index_id:
+        if stock_id not in ids:
+            return None
+        ids.discard(stock_id)
+        return {"id": str(stock_id), "op": "delete"}
+    if stock_id not in ids:
+        # Moved into index by update, client does not have it yet
+        ids.add(stock_id)
+        fields = {k: v for k, v in change["fullDocument"].items() if k != "_id"}
+        return {"id": str(stock_id), "op": "insert", "fields": fields}
+    if operation == "update":
+        fields = change["updateDescription"]["updatedFields"]
+        fields.update({i: None for i in change["updateDescription"]["removedFields"]})
+    else:
+        fields = {k: v for k, v in change["fullDocument"].items() if k != "_id"}
+    return {"id": str(stock_id), "op": operation, "fields": fields}
+
+
+async def stream_start(last_event_id: Optional[str]) -> Dict:
+    """
+    Change stream start point, resume token or current cluster time
+    503 on standalone mongod, checked before the 200 headers are sent
+    """
+    hello = await database.command("hello")
+    if "setName" not in hello:
+        raise HTTPException(
+            status_code=503,
+            detail="Stocks stream requires MongoDB replica set.",
+        )
+    if last_event_id:
+        return {"resume_after": {"_data": last_event_id}}
+    # Stream is opened lazily, pin start so no change after "ready" is lost
+    ping = await database.command("ping")
+    return {"start_at_operation_time": ping["operationTime"]}
+
+
+async def stock_events(
+    request: Request, index_id: str, start: Dict
+) -> AsyncIterator[str]:
+    """
+    Change stream on stocks collection as Server-Sent Events
+    event id is the resume token, browsers resume with Last-Event-ID
+    """
+    stocks_db = await database.stocks.find({"index_id": index_id}, {"_id": 1}).to_list(
+        None
+    )
+    ids = {i["_id"] for i in stocks_db}
+    pipeline = [
+        {
+            "$match": {
+                "$or": [
+                    {"fullDocument.index_id": index_id},
+                    {"operationType": "delete"},
+                    {"updateDescription.updatedFields.index_id": {"$exists": True}},
+                ]
+            }
+        }
+    ]
+    async with database.stocks.watch(
+        pipeline,
+        full_document="updateLookup",
+        max_await_time_ms=settings.STREAM_KEEPALIVE * 1000,
+        **start,
+    ) as stream:
+        yield f"event: ready\ndata: {json.dumps({'index_id': index_id})}\n\n"
+        while stream.alive and not await request.is_disconnected():
+            change = await stream.try_next()
+            if change is None:
+                yield ": keepalive\n\n"
+                continue
+            event = stock_event(change, index_id, ids)
+            if event is None:
+                continue
+            yield f"id: {change['_id']['_data']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@stocks_router.get("/{index}/stream")
+async def stream_stocks(
+    index: str, request: Request, last_event_id: Optional[str] = Header(None)
+) -> StreamingResponse:
+    """
+    Live stocks changes by index, only changed fields are sent,
+    stocks moved into index are sent whole as insert
+    Requires replica set (single node is enough), change streams are not
+    available on standalone mongod
+    """
+    index_db = await get_index_or_404(index)
+    start = await stream_start(last_event_id)
+    return StreamingResponse(
+        stock_events(request, str(index_db["_id"]), start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@stocks_router.get("/{index}/stats")
+async def get_stocks_stats(
+    index: str,
+    buckets: int = Query(default=10, gt=0, le=100),
+    quantiles: List[float] = Query(default=[0.1, 0.25, 0.5, 0.75, 0.9]),
+) -> Dict:
+    """
+    Ratios count, missing, mean, median, std, min, max, quantiles and
+    histogram by index, cached until index stocks are written
+    """
+    if not set(quantiles) <= set(QUANTILES):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Quantiles must be of {', '.join(str(q) for q in QUANTILES)}.",
+        )
+    quantiles = sorted(set(quantiles))
+    index_db = await get_index_or_404(index)
+    key = ("stats", buckets, tuple(quantiles))
+    stats = get_cached(index_db, key)
+    if stats is None:
+        stats = await get_index_stats(str(index_db["_id"]), buckets, quantiles)
+        set_cached(index_db, key, stats)
+    return {"index": index, **stats}
+
+
+@stocks_router.get("/{index}/snapshot")
+async def get_stocks_snapshot(index: str, request: Request) -> Response:
+    """
+    All index stocks as parallel arrays
+    id, ticker, name, momentum_12_2, momentum_avg, e_p, ma_10, div_p
+    """
+    index_db = await get_index_or_404(index)
+    snapshot = await get_snapshot(index_db)
+    return negotiate(request, {"index": index, **snapshot})
+
+
+@stocks_router.get("/{index}/export")
+async def export_index_stocks(
+    index: str,
+    format: str = Query(default="csv", regex="^(csv|parquet|arrow)$"),
+    source: str = Query(default="stocks", regex="^(stocks|snapshot)$"),
+    batch_size: int = Query(default=1000, gt=0, le=10000),
+) -> StreamingResponse:
+    """
+    Stream index stocks as csv, parquet or arrow IPC stream
+    source: stocks collection read in batches or columnar snapshot
+    """
+    index_db = await get_index_or_404(index)
+    return StreamingResponse(
+        export_stocks(index_db, format, source, batch_size),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{index}.{format}"'},
+    )
+
+
+@stocks_router.get("/{index}/covariance")
+async def get_stocks_covariance(
+    index: str,
+    window: int = Query(default=252, ge=20, le=2400),
+    kind: str = Query(default="covariance", regex="^(covariance|correlation)$"),
+    shrinkage: float = Query(default=0, ge=0, le=1),
+    format: str = Query(default="float32", regex="^(float32|json)$"),
+) -> Response:
+    """
+    Daily returns covariance or correlation matrix of index stocks
+    over last window trading days, cached per (index, window, month)
+    shrinkage: weight of diagonal target, 0 -> sample matrix
+    float32: row-major little-endian matrix body, tickers in X-Tickers header
+    """
+    index_db = await get_index_or_404(index)
+    cached = await get_covariance(index_db, window)
+    matrix = shrink(cached["matrix"], shrinkage) if shrinkage else cached["matrix"]
+    if kind == "correlation":
+        matrix = correlation(matrix)
+    matrix = matrix.astype("<f4")
+
+    if format == "json":
+        return JSONResponse(
+            {
+                "index": index,
+                "month": cached["month"],
+                "observations": cached["observations"],
+                "tickers": cached["tickers"],
+                "dropped": cached["dropped"],
+                "matrix": matrix.tolist(),
+            }
+        )
+    return Response(
+        matrix.tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Tickers": ",".join(cached["tickers"]),
+            "X-Shape": f"{len(matrix)},{len(matrix)}",
+            "X-Month": cached["month"],
+            "X-Observations": str(cached["observations"]),
+        },
+    )
+
+
 @stocks_router.get("/{index}")
 async def get_stocks_list(
     index: str,
+    request: Request,
     sort_by: str = Body(embed=True, default="momentum_12_2"),
     desc: bool = Body(emdeb=True, default=False),
     limit: int = Body(embed=True, default=20),
-) -> List:
+) -> Response:
     """
     Stocks list by index by params
     """
@@ -150,4 +527,4 @@ async def get_stocks_list(
         StocksDB(**i, id=str(i["_id"])).dict(exclude_unset=True) for i in stocks_db
     ]
 
-    return stocks_output
+    return negotiate(request, stocks_output)
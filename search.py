@@ -0,0 +1,155 @@
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import logging
+import re
+
+from db import database  # type: ignore
+from settings import Settings  # type: ignore
+
+settings: Any = Settings()
+logger = logging.getLogger(__name__)
+
+# Lists searched in rank order: ticker prefix, name prefix, name word prefix
+TERM_KINDS = ["ticker", "name", "token"]
+
+
+def tokenize(text: str) -> List[str]:
+    return [i for i in re.split(r"[^\w]+", text.lower()) if i]
+
+
+class SearchIndex:
+    """
+    In-memory prefix search over stocks and indexes names and tickers
+    every term kind is a sorted list of (term, id), a prefix lookup is
+    one bisect plus a scan over matching terms only
+    """
+
+    def __init__(self) -> None:
+        self.documents: Dict[str, Dict] = {}
+        self.terms: Dict[str, List[Tuple[str, str]]] = {i: [] for i in TERM_KINDS}
+
+    def document_terms(self, document: Dict) -> Iterator[Tuple[str, str]]:
+        yield "ticker", document["ticker"].lower()
+        yield "name", document["name"].lower()
+        # Ticker is a token too, so "aapl apple" finds Apple by either word
+        for token in set(tokenize(document["name"])) | {document["ticker"].lower()}:
+            yield "token", token
+
+    def store(self, kind: str, document: Dict) -> str:
+        doc_id = str(document["_id"])
+        self.documents[doc_id] = {
+            "id": doc_id,
+            "kind": kind,
+            "ticker": document["ticker"],
+            "name": document["name"],
+            "index_id": document.get("index_id"),
+        }
+        return doc_id
+
+    def add(self, kind: str, document: Dict) -> None:
+        """
+        Add or replace stock/index document from database
+        """
+        self.remove(str(document["_id"]))
+        doc_id = self.store(kind, document)
+        for term_kind, term in self.document_terms(document):
+            insort(self.terms[term_kind], (term, doc_id))
+
+    def remove(self, doc_id: str) -> None:
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        for term_kind, term in self.document_terms(document):
+            terms = self.terms[term_kind]
+            position = bisect_left(terms, (term, doc_id))
+            if position < len(terms) and terms[position] == (term, doc_id):
+                del terms[position]
+
+    def load(self, stocks: List[Dict], indexes: List[Dict]) -> None:
+        """
+        Rebuild from full collections, swaps structures in one step
+        """
+        fresh = SearchIndex()
+        for kind, documents in [("index", indexes), ("stock", stocks)]:
+            for document in documents:
+                doc_id = fresh.store(kind, document)
+                for term_kind, term in fresh.document_terms(document):
+                    fresh.terms[term_kind].append((term, doc_id))
+        # One sort per term kind, insort per term is quadratic
+        for terms in fresh.terms.values():
+            terms.sort()
+        self.documents, self.terms = fresh.documents, fresh.terms
+
+    def prefix(self, term_kind: str, prefix: str) -> Iterator[str]:
+        terms = self.terms[term_kind]
+        position = bisect_left(terms, (prefix, ""))
+        while position < len(terms) and terms[position][0].startswith(prefix):
+            yield terms[position][1]
+            position += 1
+
+    def search(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List:
+        """
+        Case insensitive, every query word must prefix a ticker, name or name word
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        phrase = query.strip().lower()
+        results: List[Dict] = []
+        seen = set()
+        for term_kind in TERM_KINDS:
+            first = phrase if term_kind != "token" else words[0]
+            for doc_id in self.prefix(term_kind, first):
+                if doc_id in seen:
+                    continue
+                document = self.documents[doc_id]
+                if kind and document["kind"] != kind:
+                    continue
+                if term_kind == "token" and len(words) > 1:
+                    doc_tokens = tokenize(document["name"]) + [document["ticker"].lower()]
+                    if not all(any(t.startswith(w) for t in doc_tokens) for w in words[1:]):
+                        continue
+                seen.add(doc_id)
+                results.append(document)
+                if len(results) == limit:
+                    return results
+        return results
+
+
+search_index = SearchIndex()
+refresh_tasks: List[asyncio.Task] = []
+
+
+async def load_search_index() -> None:
+    projection = {"name": 1, "ticker": 1, "index_id": 1}
+    stocks = await database.stocks.find({}, projection).to_list(None)
+    indexes = await database.indexes.find({}, projection).to_list(None)
+    # Build off the event loop, swap in on it so searches never see half of it
+    fresh = SearchIndex()
+    await asyncio.get_running_loop().run_in_executor(None, fresh.load, stocks, indexes)
+    search_index.documents, search_index.terms = fresh.documents, fresh.terms
+
+
+async def refresh_search_index() -> None:
+    """
+    Pick up writes made by other workers and scripts
+    """
+    while True:
+        await asyncio.sleep(settings.SEARCH_REFRESH)
+        try:
+            await load_search_index()
+        except Exception as error:
+            logger.warning("Search index refresh failed: %s", error)
+
+
+async def start_search_index() -> None:
+    await load_search_index()
+    refresh_tasks.append(asyncio.create_task(refresh_search_index()))
+
+
+async def stop_search_index() -> None:
+    for task in refresh_tasks:
+        task.cancel()
+    await asyncio.gather(*refresh_tasks, return_exceptions=True)
+    refresh_tasks.clear()
@@ -5,6 +5,41 @@ class Settings(BaseSettings):
     DATABASE: str
     BACKEND: str
     ADMIN_HEADER: str
+    # loadtest.py seeds a separate database, point the server at it with this
+    DATABASE_NAME: str = "investments"
+
+    # Production server, 0 workers -> one per CPU core
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WORKERS: int = 0
+    KEEP_ALIVE: int = 5
+    BACKLOG: int = 2048
+    GRACEFUL_TIMEOUT: int = 30
+    ACCESS_LOG: bool = False
+
+    # Threads computing ratios off the event loop
+    RATIO_WORKERS: int = 8
+
+    # Ratios jobs queue, JOB_WORKERS claim loops per API process
+    JOB_WORKERS: int = 2
+    JOB_LEASE: int = 60
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: int = 30
+    JOB_POLL: float = 2
+
+    # Seconds between keepalive comments on idle stocks streams
+    STREAM_KEEPALIVE: int = 15
+
+    # Cached index stats entries per worker process, least recently used dropped
+    INDEX_CACHE_SIZE: int = 256
+
+    # Seconds between search index reloads from database
+    SEARCH_REFRESH: int = 60
+
+    # Responses above COMPRESS_MIN_SIZE bytes are brotli/gzip compressed
+    COMPRESS_MIN_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
 
     class Config:
         env_file = ".env"
\ No newline at end of file
@@ -0,0 +1,34 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight computation
+    the computation runs as its own task, a cancelled caller does not
+    cancel it for the others
+    """
+
+    def __init__(self) -> None:
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+        self.metrics = {"calls": 0, "executed": 0, "coalesced": 0, "failed": 0}
+
+    def done(self, key: Hashable, future: asyncio.Future) -> None:
+        self.calls.pop(key, None)
+        if not future.cancelled() and future.exception() is not None:
+            self.metrics["failed"] += 1
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        self.metrics["calls"] += 1
+        future = self.calls.get(key)
+        if future is None:
+            self.metrics["executed"] += 1
+            future = asyncio.ensure_future(function())
+            self.calls[key] = future
+            future.add_done_callback(lambda f: self.done(key, f))
+        else:
+            self.metrics["coalesced"] += 1
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict:
+        return {**self.metrics, "in_flight": len(self.calls)}
@@ -0,0 +1,57 @@
+from typing import Dict
+
+from db import database  # type: ignore
+from models.stocks import RATIO_FIELDS  # type: ignore
+
+SNAPSHOT_FIELDS = ["ticker", "name"] + RATIO_FIELDS
+
+
+async def build_snapshot(index_db: Dict) -> None:
+    """
+    Columnar snapshot of index stocks, built and written inside Mongo
+    one document with parallel arrays id, ticker, name and every ratio
+    """
+    index_id = str(index_db["_id"])
+    columns = {
+        field: {"$push": {"$ifNull": [f"${field}", None]}} for field in SNAPSHOT_FIELDS
+    }
+    await database.stocks.aggregate(
+        [
+            {"$match": {"index_id": index_id}},
+            {"$sort": {"ticker": 1}},
+            {"$group": {"_id": index_id, "id": {"$push": {"$toString": "$_id"}}, **columns}},
+            {
+                "$set": {
+                    "stocks_version": index_db.get("stocks_version", 0),
+                    "built": "$$NOW",
+                }
+            },
+            {"$merge": {"into": "snapshots", "whenMatched": "replace"}},
+        ]
+    ).to_list(None)
+
+
+async def get_snapshot(index_db: Dict) -> Dict:
+    """
+    Snapshot of index, rebuilt when index stocks_version moved on
+    """
+    index_id = str(index_db["_id"])
+    version = index_db.get("stocks_version", 0)
+    snapshot = await database.snapshots.find_one({"_id": index_id})
+    if snapshot is None or snapshot["stocks_version"] != version:
+        await build_snapshot(index_db)
+        # Index without stocks, $group had nothing to merge over the old one
+        await database.snapshots.delete_one(
+            {"_id": index_id, "stocks_version": {"$ne": version}}
+        )
+        snapshot = await database.snapshots.find_one({"_id": index_id})
+    if snapshot is None:
+        return {
+            "stocks_version": version,
+            "built": None,
+            "id": [],
+            **{field: [] for field in SNAPSHOT_FIELDS},
+        }
+    del snapshot["_id"]
+    snapshot["built"] = snapshot["built"].isoformat()
+    return snapshot
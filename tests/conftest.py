@@ -15,7 +15,7 @@ def backend():
 @pytest.fixture(scope="session")
 def database():
     client = pymongo.MongoClient(str(settings.DATABASE))
-    mydb = client.investments
+    mydb = client[settings.DATABASE_NAME]
     return mydb
 
 
@@ -57,6 +57,18 @@ def stock_db(database, index_db):
     database.stocks.delete_many({"name": data["name"]})
 
 
+@pytest.fixture(scope="function")
+def stock_jobs(database, stock_db):
+    """
+    stock_db with no ratios jobs or history left from other runs
+    """
+    database.jobs.delete_many({"ticker": stock_db["ticker"]})
+    database.ratios_history.delete_many({"ticker": stock_db["ticker"]})
+    yield stock_db
+    database.jobs.delete_many({"ticker": stock_db["ticker"]})
+    database.ratios_history.delete_many({"ticker": stock_db["ticker"]})
+
+
 @pytest.fixture(scope="function")
 def stocks_index(database, index_db):
     stocks_list = []
@@ -3,7 +3,16 @@ from datetime import datetime, timedelta
 import pytest
 from dateutil.relativedelta import relativedelta
 
-from ratios import momentum_12, momentum_avg, div_p, e_p, ma_10, define_time
+from ratios import (
+    momentum_12,
+    momentum_avg,
+    div_p,
+    e_p,
+    ma_10,
+    define_time,
+    get_ratios,
+    get_sources,
+)
 
 
 def test_define_time():
@@ -24,6 +33,44 @@ def test_define_time():
     assert time_test[1].strftime("%Y-%m-%d") == last_month.strftime("%Y-%m-%d")
 
 
+def test_define_time_as_of():
+    """
+    GIVEN Past as_of date
+    WHEN Call define_time function with as_of
+    THEN period from 28th of month before as_of, 12 months back
+    """
+    year_ago, last_month = define_time(datetime(2020, 3, 15))
+
+    assert year_ago == datetime(2019, 2, 28)
+    assert last_month == datetime(2020, 2, 28)
+
+
+def test_e_p_as_of_without_statements():
+    """
+    GIVEN Income statements all ended after as_of
+    WHEN call e_p as of that date
+    THEN e_p is None
+    """
+    income = [(datetime(2021, 12, 31), 100), (datetime(2020, 12, 31), 90)]
+
+    assert e_p("MSFT", datetime(2020, 6, 1), income=income, shares=10) is None
+
+
+@pytest.mark.parametrize("ticker", ["MSFT", "MCD"])
+def test_ratios_as_of_sources(ticker):
+    """
+    GIVEN Sources downloaded once for 2019-2021
+    WHEN call get_ratios as of 2020 with sources and momentum_12 without
+    THEN momentum from sliced history == momentum from download
+    """
+    as_of = datetime(2020, 6, 1)
+    sources = get_sources(ticker, datetime(2019, 1, 1), datetime(2021, 1, 1))
+    ratios = get_ratios(ticker, as_of, sources)
+
+    assert ratios["momentum_12_2"] == momentum_12(ticker, -2, as_of)
+    assert ratios["ma_10"] in (0, 1)
+
+
 @pytest.mark.parametrize("ticker", ["MMM", "MSFT", "AAPL", "GS", "MCD", "V"])
 def test_momentum_12_1(ticker):
     """
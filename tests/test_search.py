@@ -0,0 +1,89 @@
+import timeit
+
+import pytest
+from bson import ObjectId  # type: ignore
+
+from search import SearchIndex
+
+
+@pytest.fixture(scope="function")
+def search_index():
+    index = SearchIndex()
+    index.load(
+        stocks=[
+            {"_id": ObjectId(), "name": "Apple Inc.", "ticker": "AAPL"},
+            {"_id": ObjectId(), "name": "Applied Materials", "ticker": "AMAT"},
+            {"_id": ObjectId(), "name": "Bank of America", "ticker": "BAC"},
+            {"_id": ObjectId(), "name": "American Express", "ticker": "AXP"},
+        ],
+        indexes=[{"_id": ObjectId(), "name": "S&P 500", "ticker": "SPX"}],
+    )
+    return index
+
+
+def test_search_ticker_prefix(search_index):
+    """
+    GIVEN Stocks and indexes in search index
+    WHEN Search by lowercase ticker prefix
+    THEN ticker matches first
+    """
+    results = search_index.search("a")
+
+    assert results[0]["ticker"] == "AAPL"
+    assert {i["ticker"] for i in results} == {"AAPL", "AMAT", "AXP", "BAC"}
+
+
+def test_search_name_words(search_index):
+    """
+    GIVEN Stocks and indexes in search index
+    WHEN Search by name word prefixes
+    THEN only documents with every word
+    """
+    assert [i["ticker"] for i in search_index.search("bank am")] == ["BAC"]
+    assert [i["ticker"] for i in search_index.search("appl")] == ["AAPL", "AMAT"]
+    assert [i["ticker"] for i in search_index.search("s&p", kind="index")] == ["SPX"]
+
+
+def test_search_ticker_and_name_words(search_index):
+    """
+    GIVEN Stocks and indexes in search index
+    WHEN Search by ticker followed by name word and the other way round
+    THEN document with both
+    """
+    assert [i["ticker"] for i in search_index.search("aapl apple")] == ["AAPL"]
+    assert [i["ticker"] for i in search_index.search("express axp")] == ["AXP"]
+
+
+def test_search_add_remove(search_index):
+    """
+    GIVEN Stock renamed and stock deleted
+    WHEN Search by old and new names
+    THEN search follows changes
+    """
+    apple = search_index.search("AAPL")[0]
+    search_index.add("stock", {"_id": apple["id"], "name": "Pear", "ticker": "PEAR"})
+    bank = search_index.search("BAC")[0]
+    search_index.remove(bank["id"])
+
+    assert search_index.search("apple") == []
+    assert search_index.search("pea")[0]["id"] == apple["id"]
+    assert search_index.search("bank") == []
+
+
+def test_search_latency():
+    """
+    GIVEN Search index with 50k instruments
+    WHEN Search by short prefix
+    THEN lookup under a millisecond
+    """
+    index = SearchIndex()
+    index.load(
+        stocks=[
+            {"_id": str(i), "name": f"Company {i} Holdings", "ticker": f"T{i}"}
+            for i in range(50000)
+        ],
+        indexes=[],
+    )
+    seconds = min(timeit.repeat(lambda: index.search("comp"), number=100, repeat=5))
+
+    assert seconds / 100 < 0.001
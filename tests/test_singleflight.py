@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_single_flight_coalesces_calls():
+    """
+    GIVEN 10 concurrent calls with the same key
+    WHEN call SingleFlight.do
+    THEN one execution, shared result, 9 coalesced calls
+    """
+    flight = SingleFlight()
+    executions = []
+
+    async def compute():
+        executions.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def run():
+        return await asyncio.gather(*(flight.do("MSFT", compute) for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert results == [42] * 10
+    assert len(executions) == 1
+    assert flight.stats() == {
+        "calls": 10, "executed": 1, "coalesced": 9, "failed": 0, "in_flight": 0
+    }
+
+
+def test_single_flight_shares_error():
+    """
+    GIVEN 3 concurrent calls with failing computation
+    WHEN call SingleFlight.do, then call again
+    THEN every caller gets the error, next call computes again
+    """
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("No data")
+
+    async def run():
+        return await asyncio.gather(
+            *(flight.do("MSFT", compute) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do("MSFT", compute))
+
+    assert all(isinstance(i, ValueError) for i in results)
+    assert flight.stats()["executed"] == 2
@@ -1,3 +1,10 @@
+import io
+import json
+
+import msgpack
+import numpy as np
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
 import pytest
 import requests
 
@@ -199,6 +206,99 @@ def test_get_stock_by_ticker(backend, stock_db):
     assert r_body["ticker"] == stock_db["ticker"]
 
 
+def test_get_stock_by_unknown_ticker(backend):
+    """
+    GIVEN Get stock data by unknown ticker
+    WHEN GET "/api/stocks/stock/ticker/<ticker>"
+    THEN status_code == 404
+    """
+    r = requests.get(f"{backend}/api/stocks/stock/ticker/NOTATICKER", timeout=10)
+
+    assert r.status_code == 404
+
+
+def test_get_stock_history(backend, stock_db, database):
+    """
+    GIVEN Stock with real ticker
+    WHEN GET "/api/stocks/stock/<id>/history" for 10 years downsampled to 100 points
+    THEN status_code == 200, 100 rows of date and close
+    """
+    database.stocks.update_one({"_id": stock_db["_id"]}, {"$set": {"ticker": "MSFT"}})
+    r = requests.get(
+        f"{backend}/api/stocks/stock/{str(stock_db['_id'])}/history",
+        params={"period": "10y", "points": 100},
+        timeout=30,
+    )
+    r_body = r.json()
+
+    assert r.status_code == 200
+    assert r_body["total"] > 2000
+    assert len(r_body["date"]) == len(r_body["close"]) == 100
+
+
+def test_get_stocks_batch(backend, stocks_index):
+    """
+    GIVEN Get stocks by list of tickers with one unknown ticker
+    WHEN POST "/api/stocks/batch"
+    THEN status_code == 200, found stocks with selected fields, unknown in not_found
+    """
+    tickers = [i["ticker"] for i in stocks_index]
+    r = requests.post(
+        f"{backend}/api/stocks/batch",
+        json={"tickers": tickers + ["NOTATICKER"], "fields": ["ticker"]},
+        timeout=10,
+    )
+    r_body = r.json()
+
+    assert r.status_code == 200
+    assert sorted(i["ticker"] for i in r_body["stocks"]) == sorted(tickers)
+    assert set(r_body["stocks"][0]) == {"id", "ticker"}
+    assert r_body["not_found"]["tickers"] == ["NOTATICKER"]
+
+
+def test_screen_stocks(backend, stocks_index, index_db, database):
+    """
+    GIVEN Screen index stocks by e_p > 0.25 and ma_10 == 1 sorted by momentum_avg
+    WHEN POST "/api/stocks/screener"
+    THEN status_code == 200, only matching stocks in order, plan in response
+    """
+    for i, stock in enumerate(stocks_index):
+        database.stocks.update_one(
+            {"_id": stock["_id"]},
+            {"$set": {"e_p": i / 10, "ma_10": i % 2, "momentum_avg": i}},
+        )
+    payload = {
+        "indexes": [index_db["ticker"]],
+        "filters": {"e_p": {"gt": 0.25}, "ma_10": {"eq": 1}},
+        "sort_by": "momentum_avg",
+        "explain": True,
+    }
+    r = requests.post(f"{backend}/api/stocks/screener", json=payload, timeout=10)
+    r_body = r.json()
+
+    assert r.status_code == 200
+    assert [i["ticker"] for i in r_body["stocks"]] == ["T5", "T3"]
+    assert r_body["plan"]
+
+
+@pytest.mark.parametrize(
+    "filters", [{"name": {"eq": 1}}, {"e_p": {}}, {"e_p": {"gt": None}}]
+)
+def test_screen_stocks_invalid_filter(backend, filters):
+    """
+    GIVEN Screen stocks by field that is not a ratio or by empty filter
+    WHEN POST "/api/stocks/screener"
+    THEN status_code == 422
+    """
+    r = requests.post(
+        f"{backend}/api/stocks/screener",
+        json={"filters": filters},
+        timeout=10,
+    )
+
+    assert r.status_code == 422
+
+
 def test_delete_stock(backend, stock_db, database):
     """
     GIVEN Delete stock by id
@@ -218,6 +318,265 @@ def test_delete_stock(backend, stock_db, database):
     assert stock_db_check is None
 
 
+def test_refresh_stock(backend, stock_jobs):
+    """
+    GIVEN Enqueue ratios refresh for stock
+    WHEN POST "/api/stocks/stock/<id>/refresh", GET "/api/jobs/<job_id>"
+    THEN status_code == 200, job created for 1 stock
+    """
+    r = requests.post(
+        f"{backend}/api/stocks/stock/{str(stock_jobs['_id'])}/refresh",
+        headers={"Authorization": f"{settings.ADMIN_HEADER}"},
+        timeout=10,
+    )
+    r_body = r.json()
+    r_job = requests.get(f"{backend}/api/jobs/{r_body['job_id']}", timeout=10)
+
+    assert r.status_code == 200
+    assert r_body["total"] == 1
+    assert r_job.status_code == 200
+    assert r_job.json()["total"] == 1
+
+
+def test_refresh_stock_twice(backend, stock_jobs, database):
+    """
+    GIVEN Enqueue ratios refresh for same stock twice
+    WHEN POST "/api/stocks/stock/<id>/refresh" two times
+    THEN one jobs document with both batch ids, total == 1 in both batches
+    """
+    batches = []
+    for _ in range(2):
+        r = requests.post(
+            f"{backend}/api/stocks/stock/{str(stock_jobs['_id'])}/refresh",
+            headers={"Authorization": f"{settings.ADMIN_HEADER}"},
+            timeout=10,
+        )
+        assert r.status_code == 200
+        assert r.json()["total"] == 1
+        batches.append(r.json()["job_id"])
+    jobs = list(database.jobs.find({"ticker": stock_jobs["ticker"]}))
+
+    assert len(jobs) == 1
+    assert set(jobs[0]["batches"]) == set(batches)
+    for batch_id in batches:
+        r_job = requests.get(f"{backend}/api/jobs/{batch_id}", timeout=10)
+        assert r_job.json()["total"] == 1
+
+
+def test_refresh_index_no_header(backend, index_db):
+    """
+    GIVEN Enqueue ratios refresh for index without auth header
+    WHEN POST "/api/stocks/<index>/refresh"
+    THEN status_code == 403
+    """
+    r = requests.post(
+        f"{backend}/api/stocks/{index_db['ticker']}/refresh",
+        timeout=10,
+    )
+
+    assert r.status_code == 403
+
+
+def test_stream_stocks(backend, stock_db, index_db, database):
+    """
+    GIVEN Subscribe to index stocks changes (mongo replica set)
+    WHEN GET "/api/stocks/<index>/stream", update stock in database
+    THEN status_code == 200, only changed field in event
+    """
+    with requests.get(
+        f"{backend}/api/stocks/{index_db['ticker']}/stream",
+        stream=True,
+        timeout=10,
+    ) as r:
+        lines = r.iter_lines(decode_unicode=True)
+        ready = next(line for line in lines if line.startswith("data:"))
+        database.stocks.update_one(
+            {"_id": stock_db["_id"]}, {"$set": {"momentum_12_2": 0.42}}
+        )
+        event = json.loads(next(line for line in lines if line.startswith("data:"))[5:])
+
+    assert r.status_code == 200
+    assert str(index_db["_id"]) in ready
+    assert event["id"] == str(stock_db["_id"])
+    assert event["fields"] == {"momentum_12_2": 0.42}
+
+
+def test_get_stocks_stats(backend, stocks_index, index_db, database):
+    """
+    GIVEN Index stocks with e_p for some of them
+    WHEN GET "/api/stocks/<index>/stats"
+    THEN status_code == 200, e_p count, missing, median, histogram
+    """
+    for i, stock in enumerate(stocks_index[:5]):
+        database.stocks.update_one({"_id": stock["_id"]}, {"$set": {"e_p": i / 10}})
+    r = requests.get(
+        f"{backend}/api/stocks/{index_db['ticker']}/stats",
+        params={"buckets": 5},
+        timeout=10,
+    )
+    r_body = r.json()
+    e_p = r_body["ratios"]["e_p"]
+
+    assert r.status_code == 200
+    assert r_body["count"] == len(stocks_index)
+    assert e_p["count"] == 5
+    assert e_p["missing"] == len(stocks_index) - 5
+    assert e_p["median"] == 0.2
+    assert sum(i["count"] for i in e_p["histogram"]) == 5
+
+
+def test_get_stocks_stats_no_stocks(backend, index_db):
+    """
+    GIVEN Index without stocks
+    WHEN GET "/api/stocks/<index>/stats"
+    THEN status_code == 200, every ratio empty
+    """
+    r = requests.get(f"{backend}/api/stocks/{index_db['ticker']}/stats", timeout=10)
+    r_body = r.json()
+
+    assert r.status_code == 200
+    assert r_body["count"] == 0
+    for ratio in r_body["ratios"].values():
+        assert ratio["count"] == 0
+        assert ratio["median"] is None
+
+
+def test_get_stocks_stats_unknown_quantile(backend, index_db):
+    """
+    GIVEN Index stats with quantile that is not offered
+    WHEN GET "/api/stocks/<index>/stats"
+    THEN status_code == 422
+    """
+    r = requests.get(
+        f"{backend}/api/stocks/{index_db['ticker']}/stats",
+        params={"quantiles": [0.5, 0.123]},
+        timeout=10,
+    )
+
+    assert r.status_code == 422
+
+
+def test_get_stocks_snapshot(backend, stocks_index, index_db):
+    """
+    GIVEN Index with stocks
+    WHEN GET "/api/stocks/<index>/snapshot"
+    THEN status_code == 200, parallel arrays with every index stock
+    """
+    r = requests.get(f"{backend}/api/stocks/{index_db['ticker']}/snapshot", timeout=10)
+    r_body = r.json()
+
+    assert r.status_code == 200
+    assert r_body["ticker"] == sorted(i["ticker"] for i in stocks_index)
+    assert len(r_body["e_p"]) == len(stocks_index)
+
+
+def test_get_stocks_snapshot_all_deleted(backend, stocks_index, index_db):
+    """
+    GIVEN Index snapshot built, then every index stock deleted
+    WHEN GET "/api/stocks/<index>/snapshot"
+    THEN status_code == 200, empty arrays
+    """
+    url = f"{backend}/api/stocks/{index_db['ticker']}/snapshot"
+    built = requests.get(url, timeout=10).json()
+    assert len(built["id"]) == len(stocks_index)
+    for stock_id in built["id"]:
+        requests.delete(
+            f"{backend}/api/stocks/stock/{stock_id}",
+            headers={"Authorization": f"{settings.ADMIN_HEADER}"},
+            timeout=10,
+        )
+    r = requests.get(url, timeout=10)
+    r_body = r.json()
+
+    assert r.status_code == 200
+    assert r_body["id"] == []
+    assert r_body["ticker"] == []
+
+
+@pytest.mark.parametrize("source", ["stocks", "snapshot"])
+def test_export_stocks_csv(backend, stocks_index, index_db, source):
+    """
+    GIVEN Index with stocks
+    WHEN GET "/api/stocks/<index>/export?format=csv"
+    THEN status_code == 200, header and row for every stock
+    """
+    r = requests.get(
+        f"{backend}/api/stocks/{index_db['ticker']}/export",
+        params={"format": "csv", "source": source, "batch_size": 3},
+        timeout=10,
+    )
+    rows = r.text.splitlines()
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+    assert rows[0].startswith("id,ticker,name")
+    assert len(rows) == len(stocks_index) + 1
+
+
+@pytest.mark.parametrize("source", ["stocks", "snapshot"])
+def test_export_stocks_parquet(backend, stocks_index, index_db, source):
+    """
+    GIVEN Index with stocks
+    WHEN GET "/api/stocks/<index>/export?format=parquet"
+    THEN status_code == 200, parquet file with row for every stock
+    """
+    r = requests.get(
+        f"{backend}/api/stocks/{index_db['ticker']}/export",
+        params={"format": "parquet", "source": source, "batch_size": 3},
+        timeout=10,
+    )
+    table = pq.read_table(io.BytesIO(r.content))
+
+    assert r.status_code == 200
+    assert table.column_names[:3] == ["id", "ticker", "name"]
+    assert table.num_rows == len(stocks_index)
+
+
+@pytest.mark.parametrize("source", ["stocks", "snapshot"])
+def test_export_stocks_arrow(backend, stocks_index, index_db, source):
+    """
+    GIVEN Index with stocks
+    WHEN GET "/api/stocks/<index>/export?format=arrow"
+    THEN status_code == 200, arrow IPC stream with row for every stock
+    """
+    r = requests.get(
+        f"{backend}/api/stocks/{index_db['ticker']}/export",
+        params={"format": "arrow", "source": source, "batch_size": 3},
+        timeout=10,
+    )
+    table = pa.ipc.open_stream(r.content).read_all()
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/vnd.apache.arrow.stream")
+    assert table.num_rows == len(stocks_index)
+
+
+def test_get_stocks_covariance(backend, index_db, database):
+    """
+    GIVEN Index with real tickers
+    WHEN GET "/api/stocks/<index>/covariance" as float32 correlation matrix
+    THEN status_code == 200, n x n float32 body, unit diagonal
+    """
+    tickers = ["MSFT", "AAPL", "GS"]
+    database.stocks.insert_many(
+        [
+            {"name": f"Test{i}", "ticker": i, "index_id": str(index_db["_id"])}
+            for i in tickers
+        ]
+    )
+    r = requests.get(
+        f"{backend}/api/stocks/{index_db['ticker']}/covariance",
+        params={"kind": "correlation", "window": 60},
+        timeout=60,
+    )
+    database.stocks.delete_many({"name": {"$regex": "Test"}})
+    matrix = np.frombuffer(r.content, dtype="<f4").reshape(3, 3)
+
+    assert r.status_code == 200
+    assert sorted(r.headers["X-Tickers"].split(",")) == sorted(tickers)
+    assert np.allclose(np.diag(matrix), 1, atol=1e-5)
+
+
 def test_get_stocks_list_by_index(backend, stocks_index, index_db):
     """
     GIVEN Get stocks list by index
@@ -235,6 +594,36 @@ def test_get_stocks_list_by_index(backend, stocks_index, index_db):
     assert len(r_body) == len(stocks_index)
 
 
+def test_get_stocks_list_msgpack_gzip(backend, index_db, database):
+    """
+    GIVEN Get stocks list accepting MessagePack and gzip, body above
+    COMPRESS_MIN_SIZE
+    WHEN GET "api/stocks/<index>"
+    THEN status_code == 200, gzip encoded MessagePack body with every stock
+    """
+    number = 50
+    database.stocks.insert_many(
+        [
+            {"name": f"Test{i}", "ticker": f"T{i}", "index_id": str(index_db["_id"])}
+            for i in range(number)
+        ]
+    )
+    r = requests.get(
+        f"{backend}/api/stocks/{index_db['ticker']}",
+        headers={"Accept": "application/msgpack", "Accept-Encoding": "gzip"},
+        json={"limit": number},
+        timeout=10,
+    )
+    database.stocks.delete_many({"index_id": str(index_db["_id"])})
+    r_body = msgpack.unpackb(r.content)
+
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/msgpack"
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept" in r.headers["vary"]
+    assert len(r_body) == number
+
+
 def test_get_stock_list_by_index():
     """
     GIVEN
@@ -0,0 +1,60 @@
+import numpy as np
+
+from timeseries import correlation, covariance, lttb, shrink
+
+
+def test_lttb_threshold():
+    """
+    GIVEN 2500 points daily series
+    WHEN call lttb with threshold 500
+    THEN 500 increasing indices, first and last point kept
+    """
+    x = np.arange(2500, dtype=float)
+    y = np.sin(x / 100)
+    indices = lttb(x, y, 500)
+
+    assert len(indices) == 500
+    assert indices[0] == 0 and indices[-1] == 2499
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_spike():
+    """
+    GIVEN Flat series with one spike
+    WHEN call lttb with small threshold
+    THEN spike point is selected
+    """
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[637] = 10
+    indices = lttb(x, y, 20)
+
+    assert 637 in indices
+
+
+def test_lttb_short_series():
+    """
+    GIVEN Series shorter than threshold
+    WHEN call lttb
+    THEN every index
+    """
+    x = np.arange(10, dtype=float)
+
+    assert list(lttb(x, x, 500)) == list(range(10))
+
+
+def test_covariance_correlation():
+    """
+    GIVEN Random returns panel
+    WHEN call covariance, shrink, correlation
+    THEN same as numpy cov, shrinkage keeps variances, unit diagonal correlation
+    """
+    returns = np.random.default_rng(1).normal(size=(250, 20))
+    cov = covariance(returns)
+    shrunk = shrink(cov, 0.5)
+    corr = correlation(shrunk)
+
+    assert np.allclose(cov, np.cov(returns, rowvar=False))
+    assert np.allclose(np.diag(shrunk), np.diag(cov))
+    assert np.allclose(shrunk[0, 1], cov[0, 1] / 2)
+    assert np.allclose(np.diag(corr), 1)
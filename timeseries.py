@@ -0,0 +1,54 @@
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+    returns indices of threshold points keeping the visual shape of (x, y),
+    first and last points are always kept
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    every = (length - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(int) + 1
+    edges[-1] = length - 1
+
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, length - 1
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else length
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(area.argmax())
+        indices[i + 1] = selected
+    return indices
+
+
+def covariance(returns: np.ndarray) -> np.ndarray:
+    """
+    Sample covariance of observations x assets returns panel
+    missing returns count as zero deviation from asset mean
+    """
+    deviations = np.nan_to_num(returns - np.nanmean(returns, axis=0))
+    return deviations.T @ deviations / (len(returns) - 1)
+
+
+def shrink(cov: np.ndarray, shrinkage: float) -> np.ndarray:
+    """
+    Shrink covariances towards diagonal, variances stay unchanged
+    """
+    return (1 - shrinkage) * cov + shrinkage * np.diag(np.diag(cov))
+
+
+def correlation(cov: np.ndarray) -> np.ndarray:
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.outer(std, std)
+    return np.nan_to_num(corr)